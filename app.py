@@ -3,54 +3,87 @@
 
 import os
 import sys
+import argparse
 import json
 import time
 import subprocess
 import threading
-import requests
+import random
+import uuid
 from typing import List, Tuple
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_file, abort, url_for
+from werkzeug.security import safe_join
+from werkzeug.serving import make_server
 from flask_cors import CORS
 
-from PyQt5 import QtWidgets, QtCore
-from PyQt5.QtCore import QUrl, Qt
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
-from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QShortcut
-
-import paho.mqtt.client as mqtt
+# PyQt5 (kiosk window), paho-mqtt (MQTT worker) and requests (cloud API)
+# are imported on first use, so headless runs and tests never load Qt.
 import ssl
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 from functools import partial
+from collections import deque, OrderedDict
 
 import sqlite3
+import queue
+from contextlib import contextmanager
 
-import shutil
-
-runtime_dir = "/tmp/runtime-root"
+import ctypes
+import struct
 
-if os.path.exists(runtime_dir):
-    shutil.rmtree(runtime_dir)
-
-os.makedirs(runtime_dir, mode=0o700)
+import shutil
+import gzip
+import hashlib
+import html
+import mimetypes
 
-# pylint: disable=no-member
-os.chown(runtime_dir, 0, 0)  # root:root
-# pylint: enable=no-member
+try:
+    import brotli            # optional: adds "br" next to gzip
+except ImportError:
+    brotli = None
 
-os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+APP_START = time.time()   # boot-time measurements are relative to this
 
-# ----------------------------------------------------------------------
-# 1. Qt / Chromium sandbox settings (uncomment if needed on restricted env)
-# ----------------------------------------------------------------------
-os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = "--no-sandbox"
-# os.environ["XDG_RUNTIME_DIR"] = "/tmp/runtime-root"
-os.makedirs("/tmp/runtime-root", exist_ok=True)
-os.chmod("/tmp/runtime-root", 700)
+def process_start_time() -> float:
+    """When the kernel started this process (before the interpreter and imports)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return APP_START
+
+BOOT_T0 = process_start_time()
+
+# Readiness signals of the boot sequence (see boot_services)
+_db_ready     = threading.Event()
+_mqtt_started = threading.Event()
+_flask_ready  = threading.Event()
+_boot_marks   = {}    # milestone -> seconds after BOOT_T0
+_boot_rss     = {}    # milestone -> RSS in MB when it was reached
+BOOT_MODE     = None  # "kiosk" or "headless", set by main()
+_boot_error   = None  # "<Exception>: <message>" once boot_services() has failed
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (0 if /proc is unavailable)."""
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+    except (OSError, StopIteration, ValueError):
+        return 0.0
+
+def mark_boot(name: str, at: float = None):
+    """Record (once) and log a boot milestone with the RSS at that point."""
+    if name in _boot_marks:
+        return
+    _boot_marks[name] = round((at or time.time()) - BOOT_T0, 3)
+    _boot_rss[name] = round(rss_mb(), 1)
+    print(f"[BOOT] {name} at +{_boot_marks[name] * 1000:.0f} ms, RSS {_boot_rss[name]:.1f} MB")
 
 # ----------------------------------------------------------------------
 # 2. Flask application
@@ -82,8 +115,61 @@ SYSTEM_FILES = {
 
 DB_PATH = "/var/lib/meter.db"
 
+# ----------------------------------------------------------------------
+# SQLite connection pool – WAL, tuned pragmas, reused across requests
+# ----------------------------------------------------------------------
+# Werkzeug starts a fresh thread per request, so connections are pooled
+# process-wide rather than pinned to threads (check_same_thread=False);
+# each connection is used by one borrower at a time.
+DB_POOL_SIZE           = 4      # idle connections kept open
+DB_CACHED_STATEMENTS   = 64     # prepared statements cached per connection
+DB_BUSY_TIMEOUT        = 10     # seconds to wait on a locked database
+DB_CHECKPOINT_INTERVAL = 300    # seconds between scheduled WAL checkpoints
+
+_db_pool = queue.LifoQueue()
+
+def _db_open() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT, check_same_thread=False,
+                           cached_statements=DB_CACHED_STATEMENTS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL: no fsync per commit, never corrupts
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+@contextmanager
+def db_conn():
+    """
+    Borrow a pooled connection. Like `with sqlite3.connect(...) as conn`, the
+    block commits on success and rolls back on error — but the connection
+    stays open for the next caller.
+    """
+    try:
+        conn = _db_pool.get_nowait()
+    except queue.Empty:
+        conn = _db_open()
+    try:
+        with conn:
+            yield conn
+    finally:
+        if _db_pool.qsize() < DB_POOL_SIZE:
+            _db_pool.put(conn)
+        else:
+            conn.close()
+
+def _db_checkpoint_worker():
+    """Fold the WAL back into meter.db on a schedule so it stays small on the SD card."""
+    while True:
+        time.sleep(DB_CHECKPOINT_INTERVAL)
+        try:
+            with db_conn() as conn:
+                busy, wal_pages, moved = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            if busy:
+                print(f"[DB] Checkpoint deferred — database busy ({moved}/{wal_pages} pages)")
+        except Exception as e:
+            print(f"[DB] Checkpoint failed: {e}")
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with db_conn() as conn:
         cur = conn.cursor()
         
         # Create members table if not exists
@@ -115,6 +201,11 @@ def init_db():
                 WHERE name IS NULL AND member_code IS NOT NULL
             """)
 
+        # Per-row version for optimistic concurrency on member mutations
+        if 'version' not in columns:
+            print("[DB] Adding 'version' column to members table")
+            cur.execute("ALTER TABLE members ADD COLUMN version INTEGER DEFAULT 0")
+
         # Guests table (unchanged)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS guests (
@@ -126,7 +217,42 @@ def init_db():
                 active INTEGER DEFAULT 1
             )
         """)
+
+        # Durable MQTT outbox — unsent Type 3/4 events survive crashes and reboots
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS mqtt_outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER DEFAULT 0,
+                payload TEXT NOT NULL
+            )
+        """)
+
+        # Validators of the last roster resync (conditional GET state)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS roster_sync (
+                meter_id TEXT NOT NULL,
+                hhid TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (meter_id, hhid)
+            )
+        """)
+
+        # Roster fetched after OTP verification, waiting for finalize
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS roster_staging (
+                meter_id TEXT NOT NULL,
+                hhid TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (meter_id, hhid)
+            )
+        """)
         conn.commit()
+    _db_ready.set()
 
 def deactivate_all_members_and_publish():
     """On boot: reset members to inactive and QUEUE a fresh Type 3 event"""
@@ -137,35 +263,18 @@ def deactivate_all_members_and_publish():
             return
 
         # Reset all members to inactive in DB
-        with sqlite3.connect(DB_PATH) as conn:
+        with db_conn() as conn:
             cur = conn.cursor()
-            cur.execute("UPDATE members SET active = 0 WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
+            cur.execute("UPDATE members SET active = 0, version = version + 1 WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
             count = cur.rowcount
             conn.commit()
+        invalidate_household()
         print(f"[BOOT] Deactivated {count} members in database")
 
-        # Build fresh Type 3 payload (all inactive)
-        data = load_members_data()
-        members = [
-            {
-                "member_id": m.get("member_code", ""),
-                "age": calculate_age(m["dob"]),
-                "gender": m["gender"],
-                "active": m.get("active", False)
-            }
-            for m in data.get("members", [])
-            if "dob" in m and "gender" in m and calculate_age(m["dob"]) is not None
-        ]
-
-        payload = {
-            "DEVICE_ID": METER_ID,
-            "TS": str(int(time.time())),
-            "Type": 3,
-            "Details": {"members": members}
-        }
-
-        # DIRECTLY enqueue it — bypasses any early direct-publish attempt
-        _enqueue(payload)
+        # Fresh Type 3 payload (all inactive), DIRECTLY enqueued —
+        # bypasses any early direct-publish attempt
+        payload_json, _ = member_event_json()
+        _enqueue(payload_json)
         print("[BOOT] Fresh 'all inactive' Type 3 event QUEUED — will be sent when MQTT connects")
 
     except Exception as e:
@@ -179,27 +288,18 @@ def clear_guests_and_publish():
             print("[BOOT] No HHID yet — skipping guest clear")
             return
 
-        with sqlite3.connect(DB_PATH) as conn:
+        with db_conn() as conn:
             cur = conn.cursor()
             # Delete all guests for this meter and household
             cur.execute("DELETE FROM guests WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
             deleted_count = cur.rowcount
             conn.commit()
+        invalidate_household()
 
         print(f"[BOOT] Removed {deleted_count} guests from database")
 
-        # Build fresh Type 4 payload — empty guests list
-        payload = {
-            "DEVICE_ID": METER_ID,
-            "TS": str(int(time.time())),
-            "Type": 4,
-            "Details": {
-                "guests": []   # Empty list = no guests
-            }
-        }
-
-        # Directly enqueue it
-        _enqueue(payload)
+        # Fresh Type 4 payload — empty guests list = no guests. Directly enqueue it
+        _enqueue(guest_event_json())
         print("[BOOT] Fresh 'no guests' Type 4 event QUEUED")
 
     except Exception as e:
@@ -225,12 +325,13 @@ def get_meter_id():
 # ----------------------------------------------------------------------
 # 4. Load meter-id
 # ----------------------------------------------------------------------
-try:
-    with open(DEVICE_CONFIG["device_id_file"], "r") as f:
-        METER_ID = f.read().strip()
-except FileNotFoundError:
+METER_ID = None    # set by init_device()
+
+def init_device():
+    """Reads the meter id from device_id_file; call once before serving."""
+    global METER_ID
     METER_ID = get_meter_id()
-print(f"[INFO] METER_ID = {METER_ID}")
+    print(f"[INFO] METER_ID = {METER_ID}")
 
 # ----------------------------------------------------------------------
 # 5. Helper utilities
@@ -243,87 +344,512 @@ def run_system_command(command: List[str]) -> Tuple[bool, str]:
         return False, e.stderr
 
 
-def current_state() -> str:
-    if not os.path.exists(SYSTEM_FILES["current_state"]):
-        with open(SYSTEM_FILES["current_state"], "w") as f:
-            f.write("welcome")
-    return open(SYSTEM_FILES["current_state"]).read().strip()
+# ----------------------------------------------------------------------
+# Flag files – every SYSTEM_FILES entry mirrored in memory
+# ----------------------------------------------------------------------
+# One thread watches the parent directories with inotify and re-reads a
+# flag only when the kernel reports a change (polling if inotify is not
+# available). Readers get the snapshot; subscribers are called with
+# (name, entry) from the watcher thread whenever an entry changes. Our
+# own writes go through write_flag() so the snapshot is never stale.
+FLAG_POLL_INTERVAL = 1.0    # fallback stat sweep when inotify is unavailable
+
+# No IN_CREATE/IN_MODIFY: they fire mid-write; IN_CLOSE_WRITE follows them
+_IN_ATTRIB, _IN_CLOSE_WRITE = 0x004, 0x008
+_IN_MOVED_FROM, _IN_MOVED_TO, _IN_DELETE = 0x040, 0x080, 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_WATCH_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE
+
+_flags_lock        = threading.Lock()
+_flags             = {}     # name -> {"exists": bool, "content": str or None}
+_flag_subscribers  = []
+_flag_watch_thread = None
+
+def _read_flag(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return {"exists": True, "content": f.read().strip()}
+    except FileNotFoundError:
+        return {"exists": False, "content": None}
+    except OSError:
+        return {"exists": os.path.exists(path), "content": None}   # present but unreadable
+
+def refresh_flag(name: str) -> dict:
+    """Re-read one flag into the snapshot and notify subscribers if it changed."""
+    with _flags_lock:
+        entry = _read_flag(SYSTEM_FILES[name])
+        changed = _flags.get(name) != entry
+        _flags[name] = entry
+        subscribers = list(_flag_subscribers) if changed else []
+    for callback in subscribers:
+        try:
+            callback(name, entry)
+        except Exception as e:
+            print(f"[FLAGS] Subscriber failed on {name}: {e}")
+    return entry
+
+def get_flag(name: str) -> dict:
+    start_flag_watcher()
+    with _flags_lock:
+        entry = _flags.get(name)
+    return entry if entry is not None else refresh_flag(name)
+
+def flag_exists(name: str) -> bool:
+    return get_flag(name)["exists"]
+
+def write_flag(name: str, content: str):
+    """Atomic replace (temp file + rename), then refresh the snapshot."""
+    path = SYSTEM_FILES[name]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    refresh_flag(name)
+
+def subscribe_flags(callback):
+    """callback(name, entry) runs on every change of a SYSTEM_FILES flag."""
+    with _flags_lock:
+        _flag_subscribers.append(callback)
+
+def _flag_inotify_loop():
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    by_dir = {}
+    for name, path in SYSTEM_FILES.items():
+        by_dir.setdefault(os.path.dirname(path), {})[os.path.basename(path)] = name
+    watches = {}
+    for directory, names in by_dir.items():
+        wd = libc.inotify_add_watch(fd, directory.encode(), _IN_WATCH_MASK)
+        if wd < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        watches[wd] = names
+    print(f"[FLAGS] inotify watching {len(watches)} directories")
+
+    # Watches are in place, so nothing can slip between this sweep and the events
+    for name in SYSTEM_FILES:
+        refresh_flag(name)
+    while True:
+        buf = os.read(fd, 4096)
+        pending, offset = set(), 0
+        while offset + 16 <= len(buf):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", buf, offset)
+            filename = buf[offset + 16:offset + 16 + length].rstrip(b"\0").decode(errors="replace")
+            offset += 16 + length
+            if mask & _IN_Q_OVERFLOW:
+                pending.update(SYSTEM_FILES)
+            elif filename in watches.get(wd, {}):
+                pending.add(watches[wd][filename])
+        for name in pending:
+            refresh_flag(name)
+
+def _flag_stat(path: str):
+    """What a write or replace of the file changes; None while it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+def _flag_watch_worker():
+    try:
+        _flag_inotify_loop()
+    except Exception as e:
+        print(f"[FLAGS] inotify unavailable ({e}) — polling every {FLAG_POLL_INTERVAL}s")
+    # Fallback: stat every flag, re-read only those whose inode/mtime/size moved
+    seen = {}
+    while True:
+        for name, path in SYSTEM_FILES.items():
+            sig = _flag_stat(path)
+            if name not in seen or seen[name] != sig:
+                seen[name] = sig
+                refresh_flag(name)
+        time.sleep(FLAG_POLL_INTERVAL)
+
+def start_flag_watcher():
+    global _flag_watch_thread
+    with _flags_lock:
+        if _flag_watch_thread is not None:
+            return
+        _flag_watch_thread = threading.Thread(target=_flag_watch_worker, daemon=True)
+    _flag_watch_thread.start()
 
-def set_current_state(state: str):
-    with open(SYSTEM_FILES["current_state"], "w") as f:
-        f.write(state)
+
+# ----------------------------------------------------------------------
+# Installation state machine – held in memory, persisted on change only
+# ----------------------------------------------------------------------
+# Endpoints that run on every poll (check_wifi, check_gsm, video_detection)
+# re-assert the step they belong to; that is a no-op unless the step
+# actually changes. Moving back (retry, change network) or one step
+# forward is allowed; anything else is refused and logged, never fatal.
+INSTALL_FLOW = (
+    "welcome", "connect_select", "hhid_input", "otp_verification",
+    "input_source_detection", "video_object_detection", "finalize"
+)
+_INSTALL_SKIPS = {("input_source_detection", "finalize")}   # line-in: no video step
+
+_install_lock  = threading.Lock()
+_install_state = None    # None = not loaded from disk yet
+
+def _install_transition_ok(current: str, target: str) -> bool:
+    i, j = INSTALL_FLOW.index(current), INSTALL_FLOW.index(target)
+    return j <= i + 1 or (current, target) in _INSTALL_SKIPS
+
+def current_state() -> str:
+    global _install_state
+    with _install_lock:
+        if _install_state is None:
+            stored = get_flag("current_state")["content"]
+            _install_state = stored if stored in INSTALL_FLOW else "welcome"
+        return _install_state
+
+def set_current_state(state: str) -> bool:
+    """Move the install flow to state. Returns False if the transition is refused."""
+    global _install_state
+    current_state()
+    with _install_lock:
+        previous = _install_state
+        if state == previous:
+            return True
+        if state not in INSTALL_FLOW or not _install_transition_ok(previous, state):
+            print(f"[STATE] Refused transition {previous} → {state}")
+            return False
+        write_flag("current_state", state)
+        _install_state = state
+    print(f"[STATE] {previous} → {state}")
+    return True
 
 
 def is_installation_done() -> bool:
-    if not os.path.exists(SYSTEM_FILES["install_done"]):
-        with open(SYSTEM_FILES["install_done"], "w") as f:
-            f.write("0")
-    return open(SYSTEM_FILES["install_done"]).read().strip() == "1"
+    entry = get_flag("install_done")
+    if not entry["exists"]:
+        write_flag("install_done", "0")
+        return False
+    return entry["content"] == "1"
 
 
 def set_installation_done():
-    with open(SYSTEM_FILES["install_done"], "w") as f:
-        f.write("1")
+    if not is_installation_done():
+        write_flag("install_done", "1")
+
+
+# ----------------------------------------------------------------------
+# Server-push events – typed state changes streamed to the UI (/api/events)
+# ----------------------------------------------------------------------
+# Every SSE client owns a bounded queue. emit_event() never blocks the
+# producer: a client that falls EVENTS_CLIENT_QUEUE frames behind is cut
+# off and reconnects. The last frame of each kind is replayed on connect,
+# so a (re)connecting client starts from the current state.
+EVENTS_CLIENT_QUEUE = 64      # pending frames per client before it is dropped
+EVENTS_KEEPALIVE    = 15      # seconds between SSE comment pings
+EVENTS_RETRY_MS     = 2000    # reconnect delay advertised to EventSource
+
+_events_lock    = threading.Lock()
+_events_clients = set()
+_events_last    = {}          # kind -> (data, frame)
+_events_seq     = 0
+
+def emit_event(kind: str, data, only_if_changed: bool = False):
+    """Push one typed event to every connected client."""
+    global _events_seq
+    with _events_lock:
+        last = _events_last.get(kind)
+        if only_if_changed and last is not None and last[0] == data:
+            return
+        _events_seq += 1
+        frame = f"id: {_events_seq}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        _events_last[kind] = (data, frame)
+        for q in list(_events_clients):
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                # Too slow: drop its backlog and end the stream
+                _events_clients.discard(q)
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(None)
+
+def has_event_clients() -> bool:
+    return bool(_events_clients)
+
+def _events_subscribe() -> queue.Queue:
+    q = queue.Queue(maxsize=EVENTS_CLIENT_QUEUE)
+    with _events_lock:
+        for _, frame in _events_last.values():
+            q.put_nowait(frame)
+        _events_clients.add(q)
+    return q
+
+def _events_unsubscribe(q: queue.Queue):
+    with _events_lock:
+        _events_clients.discard(q)
+
+
+# ----------------------------------------------------------------------
+# Household cache – HHID, members and guests served from memory.
+# Our own save functions are the only writers, so they update the cache
+# (write-through) under _hh_lock; anything that changes the tables behind
+# their back calls invalidate_household(). Every change bumps the version.
+# ----------------------------------------------------------------------
+_hh_lock    = threading.RLock()
+_hh_version = 0
+_hh_hhid    = None    # None = not loaded yet
+_hh_members = None
+_hh_guests  = None
+
+def household_version() -> int:
+    return _hh_version
+
+def invalidate_household():
+    global _hh_version, _hh_hhid, _hh_members, _hh_guests
+    with _hh_lock:
+        _hh_hhid = _hh_members = _hh_guests = None
+        _hh_version += 1
+    emit_household()
+
+def emit_household(members: bool = True, guests: bool = True):
+    """Push the current roster and/or guest list to event-stream clients."""
+    if not has_event_clients():
+        return   # a client that connects later gets a fresh snapshot
+    try:
+        with _hh_lock:
+            version = _hh_version
+            member_list = load_members_data()["members"] if members else None
+            guest_list = load_guests_data() if guests else None
+        if member_list is not None:
+            emit_event("members", {"version": version, "members": member_list}, only_if_changed=True)
+        if guest_list is not None:
+            emit_event("guests", guests_event(version, guest_list), only_if_changed=True)
+    except Exception as e:
+        print(f"[EVENTS] Household push failed: {e}")
+
+
+def guests_event(version: int, guest_list: list) -> dict:
+    return {"version": version, "count": len(guest_list), "guests": guest_list}
 
 
 def save_hhid(hhid: str):
-    with open(DEVICE_CONFIG["hhid_file"], "w") as f:
-        f.write(hhid)
+    global _hh_hhid
+    with _hh_lock:
+        with open(DEVICE_CONFIG["hhid_file"], "w") as f:
+            f.write(hhid)
+        if hhid.strip() != _hh_hhid:
+            invalidate_household()
+        _hh_hhid = hhid.strip()
 
 
 def load_hhid() -> str:
-    try:
-        with open(DEVICE_CONFIG["hhid_file"], "r") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return ""
+    global _hh_hhid
+    with _hh_lock:
+        if _hh_hhid is None:
+            try:
+                with open(DEVICE_CONFIG["hhid_file"], "r") as f:
+                    _hh_hhid = f.read().strip()
+            except FileNotFoundError:
+                return ""
+        return _hh_hhid
 
 
 def save_members_data(data: dict):
+    global _hh_version, _hh_members
     meter_id = data.get("meter_id", METER_ID)
     hhid = data.get("hhid", load_hhid())
     members = data.get("members", [])
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM members WHERE meter_id = ? AND hhid = ?", (meter_id, hhid))
+    with _hh_lock, db_conn() as conn:
+        # Diff against the stored rows (matched by member_code) so unchanged
+        # members are not rewritten and every row keeps its id.
+        existing = {}
+        for row in conn.execute("""
+            SELECT id, member_code, name, dob, gender, created_at, active
+            FROM members WHERE meter_id = ? AND hhid = ? ORDER BY id
+        """, (meter_id, hhid)):
+            existing.setdefault(row[1], []).append(row)
+
+        inserts, updates = [], []
         for m in members:
-            cur.execute("""
-                INSERT INTO members (
-                    meter_id, hhid, member_code, name, dob, gender, created_at, active
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                meter_id, hhid,
+            values = (
                 m.get("member_code"),
                 m.get("name", m.get("member_code")),  # fallback to member_code if name missing
                 m.get("dob"),
                 m.get("gender"),
                 m.get("created_at"),
                 int(m.get("active", False))
-            ))
+            )
+            matches = existing.get(values[0])
+            if matches:
+                row = matches.pop(0)
+                if tuple(row[1:]) != values:
+                    updates.append(values[1:] + (row[0],))
+            else:
+                inserts.append((meter_id, hhid) + values)
+        deletes = [(row[0],) for rows in existing.values() for row in rows]
+
+        conn.executemany("DELETE FROM members WHERE id = ?", deletes)
+        conn.executemany("""
+            UPDATE members SET name = ?, dob = ?, gender = ?, created_at = ?, active = ?,
+                               version = version + 1
+            WHERE id = ?
+        """, updates)
+        conn.executemany("""
+            INSERT INTO members (
+                meter_id, hhid, member_code, name, dob, gender, created_at, active
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, inserts)
         conn.commit()
+        print(f"[DB] Members saved: +{len(inserts)} ~{len(updates)} -{len(deletes)}")
+
+        # Refresh the cache from the rows just written (ids, order and versions)
+        if meter_id == METER_ID and hhid == load_hhid():
+            _hh_members = _query_members(conn, hhid)
+        else:
+            _hh_members = None
+        _hh_version += 1
+    emit_household(guests=False)
+
+
+def apply_roster_delta(hhid: str, members: list) -> Tuple[int, int, int]:
+    """
+    Brings the stored roster in line with the server's in one transaction.
+    New members are added inactive, missing ones removed; for the others
+    only dob/gender/created_at are taken from the server, so local names
+    and active flags survive. Returns (added, removed, changed).
+    """
+    global _hh_version, _hh_members
+    with _hh_lock, db_conn() as conn:
+        existing = {row[1]: row for row in conn.execute("""
+            SELECT id, member_code, dob, gender, created_at
+            FROM members WHERE meter_id = ? AND hhid = ? ORDER BY id
+        """, (METER_ID, hhid))}
+        server = {m["member_code"]: (m["dob"], m["gender"], m.get("created_at")) for m in members}
+
+        inserts = [(METER_ID, hhid, code, code) + fields
+                   for code, fields in server.items() if code not in existing]
+        deletes = [(row[0],) for code, row in existing.items() if code not in server]
+        updates = [fields + (existing[code][0],)
+                   for code, fields in server.items() if code in existing and tuple(existing[code][2:]) != fields]
+        if not (inserts or deletes or updates):
+            return 0, 0, 0
+
+        conn.executemany("DELETE FROM members WHERE id = ?", deletes)
+        conn.executemany("""
+            UPDATE members SET dob = ?, gender = ?, created_at = ?, version = version + 1
+            WHERE id = ?
+        """, updates)
+        conn.executemany("""
+            INSERT INTO members (meter_id, hhid, member_code, name, dob, gender, created_at, active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+        """, inserts)
+        print(f"[DB] Roster delta applied: +{len(inserts)} ~{len(updates)} -{len(deletes)}")
+
+        _hh_members = _query_members(conn, hhid) if hhid == load_hhid() else None
+        _hh_version += 1
+    emit_household(guests=False)
+    return len(inserts), len(deletes), len(updates)
+
+
+_MEMBER_COLUMNS = "member_code, name, dob, gender, created_at, active, version"
+
+def _member_from_row(row) -> dict:
+    return {
+        "member_code": row[0],
+        "name": row[1] or row[0],  # fallback to member_code if name is NULL
+        "dob": row[2],
+        "gender": row[3],
+        "created_at": row[4],
+        "active": bool(row[5]),
+        "version": row[6] or 0
+    }
+
+def _query_members(conn, hhid: str) -> list:
+    cur = conn.execute(f"""
+        SELECT {_MEMBER_COLUMNS}
+        FROM members WHERE meter_id = ? AND hhid = ? ORDER BY id
+    """, (METER_ID, hhid))
+    return [_member_from_row(row) for row in cur.fetchall()]
 
 
 def load_members_data() -> dict:
-    hhid = load_hhid()
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT member_code, name, dob, gender, created_at, active
-            FROM members WHERE meter_id = ? AND hhid = ?
-        """, (METER_ID, hhid))
-        members = []
-        for row in cur.fetchall():
-            members.append({
-                "member_code": row[0],
-                "name": row[1] or row[0],  # fallback to member_code if name is NULL
-                "dob": row[2],
-                "gender": row[3],
-                "created_at": row[4],
-                "active": bool(row[5])
-            })
+    """Current household members. Returns copies — callers may mutate them freely."""
+    global _hh_members
+    with _hh_lock:
+        hhid = load_hhid()
+        if _hh_members is None:
+            with db_conn() as conn:
+                _hh_members = _query_members(conn, hhid)
+        members = [dict(m) for m in _hh_members]
     return {"meter_id": METER_ID, "hhid": hhid, "members": members}
 
 
+_SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def update_member(member_code: str, changes: dict, expected_version: int = None) -> Tuple[str, dict]:
+    """
+    Single-row update of one member, addressed by member_code.
+
+    changes maps "active" and/or "name" to new values; "active": "toggle"
+    flips the stored flag atomically in SQL. With expected_version the
+    update only applies if nobody changed the row since the caller read it.
+
+    Returns (status, member): status is "ok", "conflict" (member holds the
+    current row) or "not_found" (member is None).
+    """
+    global _hh_version
+    sets, params = [], []
+    if "active" in changes:
+        if changes["active"] == "toggle":
+            sets.append("active = 1 - active")
+        else:
+            sets.append("active = ?")
+            params.append(int(bool(changes["active"])))
+    if "name" in changes:
+        sets.append("name = ?")
+        params.append(changes["name"])
+    sets.append("version = version + 1")
+
+    hhid = load_hhid()
+    where = "meter_id = ? AND hhid = ? AND member_code = ?"
+    params += [METER_ID, hhid, member_code]
+    if expected_version is not None:
+        where += " AND version = ?"
+        params.append(expected_version)
+
+    with _hh_lock, db_conn() as conn:
+        sql = f"UPDATE members SET {', '.join(sets)} WHERE {where}"
+        if _SQLITE_RETURNING:
+            row = conn.execute(f"{sql} RETURNING {_MEMBER_COLUMNS}", params).fetchone()
+        else:
+            cur = conn.execute(sql, params)
+            row = None
+            if cur.rowcount:
+                row = conn.execute(
+                    f"SELECT {_MEMBER_COLUMNS} FROM members WHERE meter_id = ? AND hhid = ? AND member_code = ?",
+                    (METER_ID, hhid, member_code)
+                ).fetchone()
+
+        if row is None:
+            current = conn.execute(
+                f"SELECT {_MEMBER_COLUMNS} FROM members WHERE meter_id = ? AND hhid = ? AND member_code = ?",
+                (METER_ID, hhid, member_code)
+            ).fetchone()
+            if current is None:
+                return "not_found", None
+            return "conflict", _member_from_row(current)
+
+        member = _member_from_row(row)
+        if _hh_members is not None:
+            for i, m in enumerate(_hh_members):
+                if m["member_code"] == member_code:
+                    _hh_members[i] = member
+                    break
+        _hh_version += 1
+    emit_household(guests=False)
+    return "ok", dict(member)
+
+
 # ----------------------------------------------------------------------
 # 6. MQTT Setup – ULTRA ROBUST: logs missing certs, auto-retry, instant publish
 # ----------------------------------------------------------------------
@@ -332,9 +858,49 @@ AWS_IOT_ENDPOINT    = "a3uoz4wfsx2nz3-ats.iot.ap-south-1.amazonaws.com"
 RECONNECT_DELAY     = 5
 MAX_RECONNECT_DELAY = 60
 
+OUTBOX_FLUSH_CHUNK  = 50     # rows streamed from disk per flush round
+OUTBOX_ACK_TIMEOUT  = 10     # seconds to wait for a chunk to be published
+OUTBOX_IDLE_WAKEUP  = 30     # flusher re-checks the outbox at least this often
+MQTT_QOS            = 1      # QoS 1 → on_publish fires on the broker's PUBACK
+PUBLISH_MAX_WAIT    = 8.0    # cap for routes that ask to await delivery (?wait=N)
+PUBLISH_TICKET_TTL  = 300    # seconds an unclaimed delivery ticket is kept
+PUBLISH_OUTCOMES    = 4096   # settled tickets remembered for /api/publish_status
+PUBLISH_EARLY_TTL   = 5      # seconds an unmatched PUBACK mid may still settle a publish
+
+# Backlog replay batching: several queued events packed into one frame
+#   {"DEVICE_ID": .., "TS": .., "Type": MQTT_BATCH_TYPE, "Details": {"events": [<event>, ..]}}
+# Every packed event is the original Type 3/4 payload with its own TS.
+# A frame that would hold a single event is sent as that event, unwrapped.
+MQTT_BATCH_ENABLED    = False   # backend must understand MQTT_BATCH_TYPE first
+MQTT_BATCH_TYPE       = 100
+MQTT_BATCH_MAX_EVENTS = 50
+MQTT_BATCH_MAX_BYTES  = 96 * 1024   # AWS IoT rejects messages above 128 KB
+MQTT_DRAIN_MAX_RATE   = 0       # frames per second during a drain, 0 = unlimited
+
+# Outbox bounds. Queued events always live on disk; RAM only ever holds the
+# chunk being flushed (OUTBOX_FLUSH_CHUNK rows, ≤ MQTT_BATCH_MAX_BYTES per frame).
+# When the disk quota below is reached, OUTBOX_OVERFLOW_POLICY decides:
+#   "drop_oldest_snapshot" – delete the oldest queued events to make room (default;
+#                            every Type 3/4 event is a full snapshot, so the newest
+#                            state is never lost, only older history)
+#   "block"                – wait up to OUTBOX_BLOCK_TIMEOUT for the flusher to make
+#                            room, then reject
+#   "reject"               – refuse the new event; publishing routes answer 503
+OUTBOX_MAX_EVENTS      = 50000
+OUTBOX_MAX_BYTES       = 16 * 1024 * 1024
+OUTBOX_OVERFLOW_POLICY = "drop_oldest_snapshot"
+OUTBOX_BLOCK_TIMEOUT   = 5.0
+
 client   = None
-_pub_q   = []
+mqtt     = None    # paho.mqtt.client, imported by _mqtt_worker
 _q_lock  = threading.Lock()
+_outbox_wakeup = threading.Event()
+
+_outbox_space  = threading.Condition()   # guards the counters below
+_outbox_depth  = None    # rows queued, loaded from disk on first use
+_outbox_bytes  = 0       # sum of payload lengths
+_outbox_dropped  = 0
+_outbox_rejected = 0
 
 def _mqtt_log(msg: str):
     print(f"[MQTT] {msg}")
@@ -364,27 +930,416 @@ def get_cert_paths():
         return keyfile, certfile, cafile
 
 # ----------------------------------------------------------------------
-# Queue
+# Queue – durable outbox in meter.db (mqtt_outbox table)
 # ----------------------------------------------------------------------
-def _enqueue(payload: dict):
-    with _q_lock:
-        _pub_q.append(payload)
-    _mqtt_log(f"QUEUED (size={len(_pub_q)})")
+def _outbox_load_counters():
+    """Caller holds _outbox_space. Reads depth/bytes from disk once per process."""
+    global _outbox_depth, _outbox_bytes
+    if _outbox_depth is None:
+        with db_conn() as conn:
+            _outbox_depth, _outbox_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM mqtt_outbox"
+            ).fetchone()
+
+def _outbox_size() -> int:
+    with _outbox_space:
+        _outbox_load_counters()
+        return _outbox_depth
+
+_OUTBOX_DELETE_CHUNK = 500    # seqs per statement, below SQLite's bound-parameter limit
+
+def _outbox_delete(conn, seqs: list) -> Tuple[int, int]:
+    """
+    Delete rows by seq inside the caller's transaction, one statement per
+    chunk. Seqs already gone (acked by the flusher or dropped) are skipped.
+    Returns (rows, bytes) removed.
+    """
+    rows = nbytes = 0
+    for i in range(0, len(seqs), _OUTBOX_DELETE_CHUNK):
+        chunk = seqs[i:i + _OUTBOX_DELETE_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        if _SQLITE_RETURNING:
+            sizes = [r[0] for r in conn.execute(
+                f"DELETE FROM mqtt_outbox WHERE seq IN ({marks}) RETURNING LENGTH(payload)", chunk)]
+            rows += len(sizes)
+            nbytes += sum(sizes)
+        else:
+            count, size = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM mqtt_outbox WHERE seq IN ({marks})",
+                chunk).fetchone()
+            conn.execute(f"DELETE FROM mqtt_outbox WHERE seq IN ({marks})", chunk)
+            rows += count
+            nbytes += size
+    return rows, nbytes
+
+def _outbox_release(rows: int, nbytes: int):
+    global _outbox_depth, _outbox_bytes
+    with _outbox_space:
+        _outbox_load_counters()
+        _outbox_depth -= rows
+        _outbox_bytes -= nbytes
+        _outbox_space.notify_all()
+
+def _outbox_over_quota(extra_bytes: int) -> bool:
+    return (_outbox_depth + 1 > OUTBOX_MAX_EVENTS
+            or _outbox_bytes + extra_bytes > OUTBOX_MAX_BYTES)
+
+def _outbox_make_room(extra_bytes: int) -> bool:
+    """Caller holds _outbox_space. Applies OUTBOX_OVERFLOW_POLICY; True if the event fits."""
+    global _outbox_dropped, _outbox_rejected, _outbox_depth, _outbox_bytes
+    if not _outbox_over_quota(extra_bytes):
+        return True
+
+    if OUTBOX_OVERFLOW_POLICY == "block":
+        deadline = time.time() + OUTBOX_BLOCK_TIMEOUT
+        _outbox_wakeup.set()
+        while _outbox_over_quota(extra_bytes) and time.time() < deadline:
+            _outbox_space.wait(max(0.0, deadline - time.time()))
+        if not _outbox_over_quota(extra_bytes):
+            return True
+
+    elif OUTBOX_OVERFLOW_POLICY == "drop_oldest_snapshot":
+        with db_conn() as conn:
+            dropped, evicted = 0, []
+            while _outbox_depth > 0 and _outbox_over_quota(extra_bytes):
+                # Pick just enough of the oldest rows, then delete them in one go
+                victims, depth, nbytes = [], _outbox_depth, _outbox_bytes
+                for seq, size in conn.execute(
+                    "SELECT seq, LENGTH(payload) FROM mqtt_outbox ORDER BY seq LIMIT ?", (OUTBOX_FLUSH_CHUNK,)
+                ):
+                    if not (depth + 1 > OUTBOX_MAX_EVENTS or nbytes + extra_bytes > OUTBOX_MAX_BYTES):
+                        break
+                    victims.append(seq)
+                    depth -= 1
+                    nbytes -= size
+                if not victims:
+                    break
+                rows, nbytes = _outbox_delete(conn, victims)
+                _outbox_depth -= rows
+                _outbox_bytes -= nbytes
+                dropped += rows
+                evicted.extend(victims)
+            conn.commit()
+        # Routes waiting on these rows get "dropped" now, not "queued" at the end of ?wait=
+        _settle_tickets(evicted, "dropped")
+        _outbox_dropped += dropped
+        _mqtt_log(f"OUTBOX FULL → dropped {dropped} oldest event(s) (total dropped={_outbox_dropped})")
+        if not _outbox_over_quota(extra_bytes):
+            return True
+
+    _outbox_rejected += 1
+    _mqtt_log(f"OUTBOX FULL → event rejected (policy={OUTBOX_OVERFLOW_POLICY}, "
+              f"depth={_outbox_depth}, bytes={_outbox_bytes})")
+    return False
+
+def outbox_stats() -> dict:
+    """Depth, bytes and oldest-event age of the outbox, plus overflow counters."""
+    with _outbox_space:
+        _outbox_load_counters()
+        depth, nbytes = _outbox_depth, _outbox_bytes
+        dropped, rejected = _outbox_dropped, _outbox_rejected
+    with db_conn() as conn:
+        oldest = conn.execute("SELECT enqueued_at FROM mqtt_outbox ORDER BY seq LIMIT 1").fetchone()
+    return {
+        "depth": depth,
+        "bytes": nbytes,
+        "oldest_age_s": round(time.time() - oldest[0], 1) if oldest else None,
+        "max_events": OUTBOX_MAX_EVENTS,
+        "max_bytes": OUTBOX_MAX_BYTES,
+        "policy": OUTBOX_OVERFLOW_POLICY,
+        "dropped": dropped,
+        "rejected": rejected,
+    }
+
+def _enqueue(payload):
+    """Persist an event (dict or pre-encoded JSON) to the outbox and wake the flusher. Returns its seq (or None)."""
+    global _outbox_depth, _outbox_bytes
+    seq = None
+    payload_json = payload if isinstance(payload, str) else json.dumps(payload)
+    try:
+        with _outbox_space:
+            _outbox_load_counters()
+            if _outbox_make_room(len(payload_json)):
+                with db_conn() as conn:
+                    cur = conn.execute(
+                        "INSERT INTO mqtt_outbox (enqueued_at, payload) VALUES (?, ?)",
+                        (time.time(), payload_json)
+                    )
+                    conn.commit()
+                    seq = cur.lastrowid
+                _outbox_depth += 1
+                _outbox_bytes += len(payload_json)
+                depth, nbytes = _outbox_depth, _outbox_bytes
+        if seq is not None:
+            _mqtt_log(f"QUEUED seq={seq} (size={depth}, bytes={nbytes})")
+    except Exception as e:
+        _mqtt_log(f"QUEUE WRITE FAILED: {e}")
+    _outbox_wakeup.set()
+    return seq
+
+def _outbox_contains(seq: int) -> bool:
+    with db_conn() as conn:
+        return conn.execute("SELECT 1 FROM mqtt_outbox WHERE seq = ?", (seq,)).fetchone() is not None
+
+def _outbox_fetch(after_seq: int, limit: int) -> list:
+    with db_conn() as conn:
+        return conn.execute(
+            "SELECT seq, payload FROM mqtt_outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after_seq, limit)
+        ).fetchall()
+
+def _outbox_mark_attempt(seqs: list):
+    with db_conn() as conn:
+        conn.executemany(
+            "UPDATE mqtt_outbox SET attempts = attempts + 1 WHERE seq = ?",
+            [(s,) for s in seqs]
+        )
+        conn.commit()
+
+def _outbox_ack(seqs: list):
+    """Batched delete of rows the broker has accepted; settles their tickets."""
+    if not seqs:
+        return
+    _settle_tickets(seqs, "sent")   # the broker has them, whatever the delete does
+    with db_conn() as conn:
+        rows, nbytes = _outbox_delete(conn, seqs)
+        conn.commit()
+    _outbox_release(rows, nbytes)
+
+def _pack_frames(rows: list) -> list:
+    """
+    Group outbox rows into (seqs, payload_json) frames within the batch limits.
+    Queued payloads are already JSON, so frames are assembled by string
+    concatenation rather than decoded and re-encoded.
+    """
+    if not MQTT_BATCH_ENABLED:
+        return [([seq], payload_json) for seq, payload_json in rows]
+
+    head = (f'{{"DEVICE_ID": {json.dumps(METER_ID)}, "TS": "{int(time.time())}", '
+            f'"Type": {MQTT_BATCH_TYPE}, "Details": {{"events": [')
+    tail = ']}}'
+    frames = []
+    seqs, parts, size = [], [], len(head) + len(tail)
+
+    def close():
+        if len(parts) == 1:
+            frames.append((seqs, parts[0]))
+        elif parts:
+            frames.append((seqs, head + ", ".join(parts) + tail))
+
+    for seq, payload_json in rows:
+        extra = len(payload_json) + (2 if parts else 0)   # ascii JSON: chars == bytes
+        if parts and (len(parts) >= MQTT_BATCH_MAX_EVENTS or size + extra > MQTT_BATCH_MAX_BYTES):
+            close()
+            seqs, parts, size = [], [], len(head) + len(tail)
+            extra = len(payload_json)
+        seqs.append(seq)
+        parts.append(payload_json)
+        size += extra
+    close()
+    return frames
 
 def _flush_queue():
+    """
+    Stream the outbox to the broker OUTBOX_FLUSH_CHUNK rows at a time.
+    Rows are only deleted once the broker acknowledges them, so a crash or
+    disconnect mid-flush leaves the unsent tail on disk for the next attempt.
+    With MQTT_BATCH_ENABLED each chunk goes out as a few batch frames.
+    """
     with _q_lock:
-        to_send = _pub_q[:]
-        _pub_q.clear()
-    for pl in to_send:
+        last_seq = 0
+        sent = frames_sent = bytes_sent = 0
+        started = time.time()
+        min_gap = 1.0 / MQTT_DRAIN_MAX_RATE if MQTT_DRAIN_MAX_RATE > 0 else 0.0
+        next_at = 0.0
+        while client and client.is_connected():
+            rows = _outbox_fetch(last_seq, OUTBOX_FLUSH_CHUNK)
+            if not rows:
+                break
+
+            # Rows paho still holds from before a reconnect are resent by paho
+            # itself; wait on their existing futures instead of publishing again
+            held = {}
+            with _pub_lock:
+                for seq, _ in rows:
+                    fut = _pub_by_seq.get(seq)
+                    if fut is None:
+                        continue
+                    if fut.done() and not fut.ok:
+                        del _pub_by_seq[seq]
+                    else:
+                        held.setdefault(id(fut), (fut, []))[1].append(seq)
+            in_flight = [(seqs, fut) for fut, seqs in held.values()]
+            held_seqs = {s for seqs, _ in in_flight for s in seqs}
+            fresh = [row for row in rows if row[0] not in held_seqs]
+
+            _outbox_mark_attempt([seq for seq, _ in fresh])
+            for seqs, frame in _pack_frames(fresh):
+                if min_gap:
+                    time.sleep(max(0.0, next_at - time.time()))
+                    next_at = time.time() + min_gap
+                try:
+                    fut = _publish(frame)
+                except Exception as e:
+                    _mqtt_log(f"Publish failed during flush: {e}")
+                    break
+                if fut.done() and not fut.ok:
+                    _mqtt_log(f"Publish failed during flush: seq={seqs[0]}")
+                    break
+                with _pub_lock:
+                    for s in seqs:
+                        _pub_by_seq[s] = fut
+                in_flight.append((seqs, fut))
+                frames_sent += 1
+                bytes_sent += len(frame)
+
+            # Wait for the chunk's PUBACKs, then delete in one batch
+            deadline = time.time() + OUTBOX_ACK_TIMEOUT
+            acked = []
+            for seqs, fut in in_flight:
+                if not fut.wait(max(0.0, deadline - time.time())):
+                    break
+                acked.extend(seqs)
+            _outbox_ack(acked)
+            sent += len(acked)
+
+            if len(acked) < len(rows):
+                _mqtt_log(f"Flush interrupted — {len(rows) - len(acked)} event(s) kept in outbox")
+                break
+            last_seq = rows[-1][0]
+
+        if sent:
+            _mqtt_log(f"FLUSHED {sent} queued event(s) in {frames_sent} frame(s), "
+                      f"{bytes_sent} bytes, {time.time() - started:.2f}s — {_outbox_size()} left")
+
+def _outbox_worker():
+    """Single flusher thread: drains the outbox whenever woken and connected."""
+    while True:
+        _outbox_wakeup.wait(timeout=OUTBOX_IDLE_WAKEUP)
+        _outbox_wakeup.clear()
+        if not (client and client.is_connected()):
+            continue
         try:
-            _mqtt_log(f"FLUSHING: {pl}")
-            client.publish(MQTT_TOPIC, json.dumps(pl))
+            _flush_queue()
         except Exception as e:
-            _mqtt_log(f"Publish failed during flush: {e}")
-            # Put back if failed
-            with _q_lock:
-                _pub_q.extend(to_send[to_send.index(pl):])
-            break
+            _mqtt_log(f"Outbox flush error: {e}")
+
+# ----------------------------------------------------------------------
+# Publish manager – mid → future table completed by one on_publish
+# ----------------------------------------------------------------------
+class PublishFuture:
+    """Outcome of one publish: settled True on PUBACK, False on failure/disconnect."""
+    __slots__ = ("_event", "ok", "created")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.ok = None
+        self.created = time.time()
+
+    def settle(self, ok: bool):
+        self.ok = ok
+        self._event.set()
+
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        self._event.wait(timeout)
+        return bool(self.ok)
+
+# paho keeps unacknowledged QoS 1 messages across its own reconnects and
+# resends them under the same mid, so in-flight futures survive a
+# disconnect and the flusher reuses them instead of publishing the rows
+# again. They are failed only when the client object itself is replaced.
+_pub_lock     = threading.Lock()
+_pub_by_mid   = {}     # mid → PublishFuture awaiting on_publish
+_pub_by_seq   = {}     # outbox seq → PublishFuture of the frame paho holds it in
+_pub_early    = {}     # mid → time, acknowledged before client.publish() returned
+_pub_tickets  = {}     # outbox seq → PublishFuture handed out to routes
+_pub_outcomes = OrderedDict()   # seq → "sent" | "dropped", last PUBLISH_OUTCOMES tickets
+
+def _publish(payload_json: str) -> PublishFuture:
+    """Hand one message to paho and track its mid. Never blocks on the network."""
+    fut = PublishFuture()
+    info = client.publish(MQTT_TOPIC, payload_json, qos=MQTT_QOS)
+    if info.rc != mqtt.MQTT_ERR_SUCCESS:
+        fut.settle(False)
+        return fut
+    with _pub_lock:
+        acked_at = _pub_early.pop(info.mid, None)
+        if acked_at is not None and time.time() - acked_at <= PUBLISH_EARLY_TTL:
+            early = True
+        else:
+            _pub_by_mid[info.mid] = fut
+            early = False
+    if early:
+        fut.settle(True)
+    return fut
+
+def _fail_in_flight():
+    """The client was replaced: whatever the old one still held will never be acknowledged."""
+    with _pub_lock:
+        pending = list(_pub_by_mid.values())
+        _pub_by_mid.clear()
+        _pub_by_seq.clear()
+        _pub_early.clear()
+    for fut in pending:
+        fut.settle(False)
+
+def _settle_tickets(seqs: list, outcome: str):
+    """Record the outcome of these outbox rows and release routes waiting on them."""
+    with _pub_lock:
+        for s in seqs:
+            _pub_outcomes[s] = outcome
+            _pub_outcomes.move_to_end(s)
+            _pub_by_seq.pop(s, None)
+        while len(_pub_outcomes) > PUBLISH_OUTCOMES:
+            _pub_outcomes.popitem(last=False)
+        tickets = [_pub_tickets.pop(s) for s in seqs if s in _pub_tickets]
+    for t in tickets:
+        t.settle(outcome == "sent")
+
+def publish_event(payload, wait: float = 0.0) -> Tuple[int, str]:
+    """
+    Durably queue an event and return (ticket, status) without holding the caller.
+    The ticket is the outbox seq; with wait > 0 the caller blocks up to that many
+    seconds for the PUBACK. status is "sent" once acknowledged, "dropped" if the
+    overflow policy evicted it, otherwise "queued".
+    """
+    ticket = PublishFuture()
+    now = time.time()
+    with _pub_lock:
+        for seq in [k for k, t in _pub_tickets.items() if now - t.created > PUBLISH_TICKET_TTL]:
+            del _pub_tickets[seq]
+    seq = _enqueue(payload)
+    if seq is None:
+        return None, "failed"
+    with _pub_lock:
+        _pub_tickets[seq] = ticket
+    # The row may have been sent or dropped before the ticket was registered
+    status = publish_status(seq)
+    if status != "queued":
+        with _pub_lock:
+            _pub_tickets.pop(seq, None)
+        return seq, status
+    if wait > 0:
+        ticket.wait(min(wait, PUBLISH_MAX_WAIT))
+    return seq, publish_status(seq) or "queued"
+
+def publish_status(seq: int):
+    """"queued", "sent" or "dropped"; None for a ticket this process never settled."""
+    with _pub_lock:
+        outcome = _pub_outcomes.get(seq)
+    if outcome is not None:
+        return outcome
+    return "queued" if _outbox_contains(seq) else None
+
+def _requested_wait() -> float:
+    """Optional ?wait=<seconds> on publishing routes; default is fire-and-return."""
+    try:
+        return max(0.0, min(float(request.args.get("wait", 0)), PUBLISH_MAX_WAIT))
+    except ValueError:
+        return 0.0
 
 # ----------------------------------------------------------------------
 # MQTT Callbacks
@@ -392,22 +1347,35 @@ def _flush_queue():
 def on_connect(client_, userdata, flags, rc, *args):
     if rc == 0:
         _mqtt_log("CONNECTED → flushing queue")
-        _flush_queue()
+        _outbox_wakeup.set()   # drained by _outbox_worker, never on the network thread
+        emit_event("mqtt", {"connected": True}, only_if_changed=True)
     else:
         _mqtt_log(f"CONNECT FAILED rc={rc}")
 
 def on_disconnect(client_, userdata, rc):
+    # In-flight futures stay registered: paho resends those messages after it reconnects
     _mqtt_log(f"DISCONNECTED rc={rc}" + (" (will reconnect)" if rc != 0 else ""))
+    emit_event("mqtt", {"connected": False}, only_if_changed=True)
 
 def on_publish(client_, userdata, mid):
-    _mqtt_log(f"PUBLISHED mid={mid}")
+    now = time.time()
+    with _pub_lock:
+        fut = _pub_by_mid.pop(mid, None)
+        if fut is None:
+            for stale in [m for m, t in _pub_early.items() if now - t > PUBLISH_EARLY_TTL]:
+                del _pub_early[stale]
+            _pub_early[mid] = now
+    if fut is not None:
+        fut.settle(True)
 
 # ----------------------------------------------------------------------
 # MQTT Worker Thread
 # ----------------------------------------------------------------------
 def _mqtt_worker():
-    global client
+    global client, mqtt
+    import paho.mqtt.client as mqtt
     backoff = RECONNECT_DELAY
+    _mqtt_started.set()
 
     while True:
         cert_paths = get_cert_paths()
@@ -432,6 +1400,8 @@ def _mqtt_worker():
         except Exception as e:
             _mqtt_log(f"MQTT ERROR: {e}")
 
+        # The next attempt builds a new client; messages the old one held are gone
+        _fail_in_flight()
         _mqtt_log(f"Reconnecting in {backoff}s...")
         time.sleep(backoff)
         backoff = min(backoff * 2, MAX_RECONNECT_DELAY)
@@ -440,54 +1410,132 @@ def _mqtt_worker():
 # Public API
 # ----------------------------------------------------------------------
 def init_mqtt() -> bool:
+    threading.Thread(target=_outbox_worker, daemon=True).start()
     t = threading.Thread(target=_mqtt_worker, daemon=True)
     t.start()
-    time.sleep(1)
     return True
 
 import time
 
-def publish_member_event():
-    data = load_members_data()
-    members = [
+def publish_member_event(wait: float = 0.0) -> Tuple[int, str]:
+    """Queue a Type 3 snapshot of the cached member state; returns publish_event()'s (ticket, status)."""
+    payload_json, count = member_event_json()
+    if count:
+        return publish_event(payload_json, wait=wait)
+    _mqtt_log("No valid members to publish")
+    return None, "skipped"
+
+
+# Ages only change at local midnight. Each DOB string is parsed once, its
+# age is cached for the current local day, and the age cache is dropped the
+# first time the clock is seen outside that day — at midnight, or when NTP
+# corrects a meter that booted with a wrong clock.
+_dob_parsed = {}           # dob string → (year, month, day), None if unparseable
+_age_cache  = {}           # dob string → age for _age_today
+_age_today  = None         # date the cached ages refer to
+_age_window = (0.0, 0.0)   # [start, end) of that local day, epoch seconds
+_age_lock   = threading.Lock()
+
+def _age_roll_day(now: float):
+    global _age_today, _age_window
+    today = datetime.fromtimestamp(now).date()
+    _age_window = (time.mktime(today.timetuple()),
+                   time.mktime((today + timedelta(days=1)).timetuple()))
+    _age_cache.clear()
+    _age_today = today
+
+def _age_check_day():
+    now = time.time()
+    if not (_age_window[0] <= now < _age_window[1]):
+        with _age_lock:
+            if not (_age_window[0] <= now < _age_window[1]):
+                _age_roll_day(now)
+
+def calculate_age(dob_str):
+    _age_check_day()
+    try:
+        return _age_cache[dob_str]
+    except (KeyError, TypeError):
+        pass
+
+    if dob_str not in _dob_parsed:
+        try:
+            dob = datetime.strptime(dob_str, "%Y-%m-%d")
+            _dob_parsed[dob_str] = (dob.year, dob.month, dob.day)
+        except Exception:
+            _dob_parsed[dob_str] = None
+    parsed = _dob_parsed[dob_str]
+
+    today = _age_today
+    age = None
+    if parsed is not None:
+        age = today.year - parsed[0] - ((today.month, today.day) < (parsed[1], parsed[2]))
+    _age_cache[dob_str] = age
+    return age
+
+
+# ----------------------------------------------------------------------
+# Payloads – every Type 3 / Type 4 event is encoded here
+# ----------------------------------------------------------------------
+# An event is {"DEVICE_ID", "TS", "Type", "Details"}, byte-identical to
+# json.dumps() of that dict. The encoded text is kept as a template split
+# around TS; only TS is patched per event, and the Details part is
+# re-encoded only when the household version (or the local day, for ages)
+# changes.
+_event_templates = {}   # Type → (cache key, head, tail, item count)
+
+def _event_json(event_type: int, key, build_details) -> Tuple[str, int]:
+    """
+    Encode one event. build_details() returns (details dict, item count) and
+    is only called when `key` differs from the cached template's (key=None
+    never caches). Returns (json, item count).
+    """
+    cached = _event_templates.get(event_type)
+    if key is None or cached is None or cached[0] != key:
+        details, count = build_details()
+        head = f'{{"DEVICE_ID": {json.dumps(METER_ID)}, "TS": "'
+        tail = f'", "Type": {event_type}, "Details": {json.dumps(details)}}}'
+        cached = (key, head, tail, count)
+        if key is not None:
+            _event_templates[event_type] = cached
+    return f"{cached[1]}{int(time.time())}{cached[2]}", cached[3]
+
+def member_payload_rows(members: list) -> list:
+    """Type 3 member entries; members without a usable DOB/gender are skipped."""
+    return [
         {
             "member_id": m.get("member_code", ""),   # ← Always use member_code here!
             "age": calculate_age(m["dob"]),
             "gender": m["gender"],
             "active": m.get("active", False)
         }
-        for m in data.get("members", [])
+        for m in members
         if all(k in m for k in ["dob", "gender"]) and calculate_age(m["dob"]) is not None
     ]
 
-    payload = {
-        "DEVICE_ID": METER_ID,
-        "TS": str(int(time.time())),
-        "Type": 3,
-        "Details": {"members": members}
-    }
+def member_event_json() -> Tuple[str, int]:
+    """Type 3 event for the cached member state. Returns (json, number of members)."""
+    def build():
+        rows = member_payload_rows(load_members_data().get("members", []))
+        return {"members": rows}, len(rows)
+    with _hh_lock:
+        _age_check_day()
+        return _event_json(3, (household_version(), _age_today, METER_ID), build)
 
-    if members:
-        if client and client.is_connected():
-            try:
-                _mqtt_log(f"PUBLISHING: {payload}")
-                client.publish(MQTT_TOPIC, json.dumps(payload))
-            except Exception as e:
-                _mqtt_log(f"Publish failed: {e}")
-                _enqueue(payload)
-        else:
-            _enqueue(payload)
-    else:
-        _mqtt_log("No valid members to publish")
+def guest_event_json(guests: list = None) -> str:
+    """
+    Type 4 event. Without arguments it describes the cached guests; pass
+    a list to describe exactly those guests (each reported as active).
+    """
+    if guests is not None:
+        rows = [{"age": g["age"], "gender": g["gender"], "active": True} for g in guests]
+        return _event_json(4, None, lambda: ({"guests": rows}, len(rows)))[0]
 
-
-def calculate_age(dob_str):
-    try:
-        dob = datetime.strptime(dob_str, "%Y-%m-%d")
-        today = datetime.today()
-        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-    except Exception:
-        return None
+    def build():
+        rows = [{"age": g["age"], "gender": g["gender"], "active": g["active"]} for g in load_guests_data()]
+        return {"guests": rows}, len(rows)
+    with _hh_lock:
+        return _event_json(4, (household_version(), METER_ID), build)[0]
 
 
 # ----------------------------------------------------------------------
@@ -498,19 +1546,355 @@ INITIATE_URL = f"{API_BASE}/initiate-assignment"
 VERIFY_URL   = f"{API_BASE}/verify-otp"
 MEMBERS_URL  = f"{API_BASE}/members"
 
+# ----------------------------------------------------------------------
+# Cloud API client – one keep-alive session, budgeted retries, jobs
+# ----------------------------------------------------------------------
+# Every call goes through cloud_request(): the pooled session pays the
+# TCP+TLS handshake to API Gateway once rather than per call, and each
+# endpoint has its own (connect, read) timeouts and retry budget. POSTs
+# are retried only when the request never left the meter (initiate
+# mails an OTP, verify consumes one). The members GET may also be
+# retried after a timeout or a 5xx.
+CLOUD_ENDPOINTS = {
+    # name: (connect, read) timeout, retries, idempotent
+    "initiate": {"timeout": (5, 15), "retries": 2, "idempotent": False},
+    "verify":   {"timeout": (5, 15), "retries": 2, "idempotent": False},
+    "members":  {"timeout": (5, 20), "retries": 3, "idempotent": True},
+}
+CLOUD_RETRY_STATUSES = {429, 500, 502, 503, 504}
+CLOUD_BACKOFF_BASE   = 0.5     # s; full jitter: sleep U(0, min(cap, base·2^n))
+CLOUD_BACKOFF_CAP    = 8.0
+CLOUD_POOL_SIZE      = 4
+CLOUD_STATS_SAMPLES  = 50      # latencies kept per endpoint for p50/p95
+CLOUD_JOB_TTL        = 600     # s a finished job stays queryable
+
+_cloud_lock    = threading.Lock()
+_cloud_session = None
+requests = urllib3 = None    # imported on the first call (see _import_requests)
+_cloud_stats   = {}    # endpoint -> {"calls", "errors", "retries", "last_ms", "samples"}
+
+def _import_requests():
+    global requests, urllib3
+    if requests is None:
+        import requests, urllib3
+        import requests.adapters
+
+def cloud_session() -> "requests.Session":
+    global _cloud_session
+    _import_requests()
+    with _cloud_lock:
+        if _cloud_session is None:
+            s = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CLOUD_POOL_SIZE, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _cloud_session = s
+        return _cloud_session
+
+def _cloud_record(endpoint: str, ms: float, outcome, attempt: int, failed: bool):
+    with _cloud_lock:
+        st = _cloud_stats.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "last_ms": None,
+                                                "samples": deque(maxlen=CLOUD_STATS_SAMPLES)})
+        st["calls"] += 1
+        st["errors"] += failed
+        st["retries"] += attempt > 1
+        st["last_ms"] = round(ms, 1)
+        st["samples"].append(ms)
+    print(f"[CLOUD] {endpoint} → {outcome} in {ms:.0f} ms (attempt {attempt})")
+
+def cloud_stats() -> dict:
+    def pct(samples, q):
+        ordered = sorted(samples)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+    with _cloud_lock:
+        return {name: {"calls": st["calls"], "errors": st["errors"], "retries": st["retries"],
+                       "last_ms": st["last_ms"], "p50_ms": pct(st["samples"], 0.5),
+                       "p95_ms": pct(st["samples"], 0.95)}
+                for name, st in _cloud_stats.items()}
+
+def _request_not_sent(e: Exception) -> bool:
+    """True if the connection failed before any byte of the request went out."""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(e, requests.exceptions.ConnectionError) and \
+        isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+def cloud_request(endpoint: str, method: str, url: str, **kwargs) -> "requests.Response":
+    """
+    One API call under the endpoint's timeout and retry budget. Returns the
+    last response (which may be an error status) or raises the last
+    requests exception once the budget is spent.
+    """
+    spec = CLOUD_ENDPOINTS[endpoint]
+    attempt = 0
+    while True:
+        attempt += 1
+        retries_left = attempt <= spec["retries"]
+        t0 = time.monotonic()
+        try:
+            resp = cloud_session().request(method, url, timeout=spec["timeout"], **kwargs)
+        except requests.exceptions.RequestException as e:
+            _cloud_record(endpoint, (time.monotonic() - t0) * 1000, type(e).__name__, attempt, True)
+            retryable = _request_not_sent(e) or (spec["idempotent"] and isinstance(
+                e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)))
+            if not (retryable and retries_left):
+                raise
+        else:
+            failed = resp.status_code >= 400
+            _cloud_record(endpoint, (time.monotonic() - t0) * 1000, resp.status_code, attempt, failed)
+            if not (spec["idempotent"] and resp.status_code in CLOUD_RETRY_STATUSES and retries_left):
+                return resp
+        time.sleep(random.uniform(0, min(CLOUD_BACKOFF_CAP, CLOUD_BACKOFF_BASE * 2 ** (attempt - 1))))
+
+def cloud_json(resp: "requests.Response") -> dict:
+    """Body of an API response; ValueError unless it is a JSON object."""
+    data = resp.json()
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+def cloud_failure(e: Exception) -> tuple:
+    """(body, status) for a call that raised, as the routes have always answered."""
+    _import_requests()
+    if isinstance(e, requests.exceptions.Timeout):
+        return {"success": False, "error": "Timeout"}, 504
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return {"success": False, "error": "Connection failed: please try again later"}, 503
+    if isinstance(e, ValueError):   # includes a body that is not JSON at all
+        return {"success": False, "error": f"Unexpected response from server: {e}"}, 502
+    return {"success": False, "error": str(e)}, 500
+
+# Background jobs: a route answers 202 with a job id at once, the work
+# runs in a thread and its (body, status) is pushed as a "job" event
+# (GET /api/jobs/<id> for clients without the event stream).
+_jobs_lock = threading.Lock()
+_jobs      = {}    # id -> {"id", "kind", "state", "status", "result", "started", "finished"}
+
+def _job_public(job: dict) -> dict:
+    return {k: job[k] for k in ("id", "kind", "state", "status", "result")}
+
+def start_job(kind: str, work) -> str:
+    """Runs work() -> (body, status) in the background; returns the job id."""
+    job = {"id": uuid.uuid4().hex[:12], "kind": kind, "state": "running", "status": None,
+           "result": None, "started": time.time(), "finished": None}
+    with _jobs_lock:
+        for job_id in [j["id"] for j in _jobs.values()
+                       if j["finished"] and time.time() - j["finished"] > CLOUD_JOB_TTL]:
+            del _jobs[job_id]
+        _jobs[job["id"]] = job
+
+    def run():
+        try:
+            body, status = work()
+        except Exception as e:
+            print(f"[JOBS] {kind} {job['id']} crashed: {e}")
+            body, status = {"success": False, "error": str(e)}, 500
+        with _jobs_lock:
+            job.update(state="done" if status < 400 else "failed", status=status,
+                       result=body, finished=time.time())
+        print(f"[JOBS] {kind} {job['id']} {job['state']} ({status}) in "
+              f"{(job['finished'] - job['started']) * 1000:.0f} ms")
+        emit_event("job", _job_public(job))
+
+    threading.Thread(target=run, name=f"job-{kind}", daemon=True).start()
+    return job["id"]
+
+def get_job(job_id: str):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _job_public(job) if job else None
+
+def request_object():
+    """The request's JSON body if it is an object, {} if there is none, else None."""
+    body = request.get_json(silent=True)
+    if body is None:
+        return {}
+    return body if isinstance(body, dict) else None
+
+def run_cloud_work(kind: str, work):
+    """Route helper: work() inline, or as a job when the client sent "async": true."""
+    body = request_object()
+    if body is None:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+    if body.get("async"):
+        return jsonify({"success": True, "job_id": start_job(kind, work)}), 202
+    body, status = work()
+    return jsonify(body), status
+
+# ----------------------------------------------------------------------
+# Roster prefetch – fetched right after OTP, committed by finalize
+# ----------------------------------------------------------------------
+# The installer spends minutes on the input/video screens between OTP and
+# finalize, so the roster is fetched then and staged in roster_staging.
+# finalize waits (bounded) for a prefetch still in flight and falls back
+# to a live fetch only when nothing usable was staged — and not at all
+# when the prefetch has just failed to reach the server.
+ROSTER_STAGE_MAX_AGE   = 3600  # s; an older staged roster is fetched again
+ROSTER_PREFETCH_WAIT   = 30    # s finalize waits for a prefetch still in flight
+ROSTER_PREFETCH_RECENT = 60    # s a prefetch network failure stands in for a live fetch
+
+_prefetch_lock = threading.Lock()
+_prefetch      = {}    # hhid -> {"done": Event set once finished, "error", "failed_at"}
+
+def fetch_roster(hhid: str) -> dict:
+    return cloud_json(cloud_request("members", "GET", MEMBERS_URL, params={"meterid": METER_ID, "hhid": hhid}))
+
+def roster_members(server_data: dict) -> list:
+    """Members of a /members response in save_members_data() form, all inactive."""
+    members = server_data.get("members")
+    return [
+        {
+            "member_code": m["member_code"],
+            "dob": m["dob"],
+            "gender": m["gender"],
+            "created_at": m.get("created_at"),
+            "active": False  # default off
+        }
+        for m in (members if isinstance(members, list) else [])
+        if isinstance(m, dict) and all(k in m for k in ["member_code", "dob", "gender"])
+    ]
+
+def stage_roster(hhid: str, server_data: dict):
+    with db_conn() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO roster_staging (meter_id, hhid, fetched_at, payload)
+            VALUES (?, ?, ?, ?)
+        """, (METER_ID, hhid, time.time(), json.dumps(server_data)))
+
+def load_staged_roster(hhid: str):
+    """The staged /members response for hhid, or None if missing or too old."""
+    with db_conn() as conn:
+        row = conn.execute("SELECT fetched_at, payload FROM roster_staging WHERE meter_id = ? AND hhid = ?",
+                           (METER_ID, hhid)).fetchone()
+    if row is None or time.time() - row[0] > ROSTER_STAGE_MAX_AGE:
+        return None
+    return json.loads(row[1])
+
+def clear_staged_roster(hhid: str):
+    with db_conn() as conn:
+        conn.execute("DELETE FROM roster_staging WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
+
+def _prefetch_roster(hhid: str, state: dict):
+    try:
+        server_data = fetch_roster(hhid)
+        if server_data.get("success") and isinstance(server_data.get("members"), list):
+            stage_roster(hhid, server_data)
+            print(f"[ROSTER] Prefetched {len(roster_members(server_data))} member(s) for {hhid}")
+        else:
+            print(f"[ROSTER] Prefetch refused: {server_data.get('message', 'no members')}")
+    except Exception as e:
+        print(f"[ROSTER] Prefetch failed: {e}")
+        state["error"], state["failed_at"] = e, time.time()
+    finally:
+        state["done"].set()
+
+def start_roster_prefetch(hhid: str):
+    state = {"done": threading.Event(), "error": None, "failed_at": None}
+    with _prefetch_lock:
+        _prefetch[hhid] = state
+    threading.Thread(target=_prefetch_roster, args=(hhid, state), name="roster-prefetch", daemon=True).start()
+
+def wait_roster_prefetch(hhid: str):
+    """
+    Waits up to ROSTER_PREFETCH_WAIT for a prefetch of hhid still running.
+    Returns the network error (Timeout / ConnectionError) that makes a live
+    fetch pointless right now — the prefetch timed out or failed to connect
+    within ROSTER_PREFETCH_RECENT, or is still retrying — else None.
+    """
+    with _prefetch_lock:
+        state = _prefetch.pop(hhid, None)
+    if state is None:
+        return None
+    if not state["done"].is_set():
+        print("[ROSTER] Finalize waiting for the prefetch in flight")
+        if not state["done"].wait(ROSTER_PREFETCH_WAIT):
+            _import_requests()
+            return requests.exceptions.Timeout("roster prefetch still running")
+    e = state["error"]
+    _import_requests()
+    if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)) \
+            and time.time() - state["failed_at"] <= ROSTER_PREFETCH_RECENT:
+        return e
+    return None
+
+# ----------------------------------------------------------------------
+# Roster resync – conditional poll of MEMBERS_URL after installation
+# ----------------------------------------------------------------------
+# Members added or removed in the backend reach the meter without a
+# reinstall. The poll sends If-None-Match / If-Modified-Since from the
+# last answer, so an unchanged roster costs a 304. If the API ignores
+# those headers, a digest of the roster still keeps an unchanged one
+# from touching the DB. Only a real change publishes a Type 3.
+ROSTER_RESYNC_FIRST    = 300          # s after start before the first poll
+ROSTER_RESYNC_INTERVAL = 6 * 3600     # s between polls, ±10 % jitter across meters
+
+def _roster_digest(members: list) -> str:
+    canonical = sorted((m["member_code"], m["dob"], m["gender"], m.get("created_at") or "") for m in members)
+    return hashlib.sha1(json.dumps(canonical).encode()).hexdigest()
+
+def resync_roster() -> str:
+    """One conditional poll; returns "updated", "unchanged" or "skipped"."""
+    hhid = load_hhid()
+    if not hhid or not is_installation_done():
+        return "skipped"
+    with db_conn() as conn:
+        row = conn.execute("SELECT etag, last_modified, digest FROM roster_sync WHERE meter_id = ? AND hhid = ?",
+                           (METER_ID, hhid)).fetchone()
+    etag, last_modified, digest = row or (None, None, None)
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    resp = cloud_request("members", "GET", MEMBERS_URL, params={"meterid": METER_ID, "hhid": hhid}, headers=headers)
+
+    counts = (0, 0, 0)
+    if resp.status_code == 304:
+        new_digest = digest
+    else:
+        resp.raise_for_status()
+        server_data = cloud_json(resp)
+        members = roster_members(server_data)
+        if not server_data.get("success"):
+            print(f"[ROSTER] Resync refused: {server_data.get('message', 'Failed')}")
+            return "skipped"
+        if not members and load_members_data()["members"]:
+            print("[ROSTER] Resync got an empty roster – keeping the local one")
+            return "skipped"
+        new_digest = _roster_digest(members)
+        if new_digest != digest:
+            counts = apply_roster_delta(hhid, members)
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+    with db_conn() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO roster_sync (meter_id, hhid, etag, last_modified, digest, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (METER_ID, hhid, etag, last_modified, new_digest, time.time()))
+
+    if any(counts):
+        print(f"[ROSTER] Resync: +{counts[0]} -{counts[1]} ~{counts[2]} member(s)")
+        publish_member_event()
+        return "updated"
+    print(f"[ROSTER] Resync: unchanged ({resp.status_code})")
+    return "unchanged"
+
+def _roster_resync_worker():
+    time.sleep(ROSTER_RESYNC_FIRST)
+    while True:
+        try:
+            resync_roster()
+        except Exception as e:
+            print(f"[ROSTER] Resync failed: {e}")
+        time.sleep(ROSTER_RESYNC_INTERVAL * random.uniform(0.9, 1.1))
+
 # === GUESTS FILE ===
 
 def load_guests_count():
     """Fast count — used by main dashboard"""
-    try:
-        hhid = load_hhid()
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM guests WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
-            return cur.fetchone()[0]
-    except Exception as e:
-        print(f"[GUESTS] Count error: {e}")
-        return 0
+    return len(load_guests_data())
 
 def get_guests_for_ui():
     """Full list — used when opening Add Guest dialog"""
@@ -522,12 +1906,13 @@ def get_guests_for_ui():
 @app.route("/api/guest_count", methods=["GET"])
 def api_guest_count():
     count = load_guests_count()
-    return jsonify({"success": True, "count": count}), 200
+    return jsonify({"success": True, "count": count, "version": household_version()}), 200
 
 @app.route("/api/guests_list", methods=["GET"])
 def api_guests_list():
-    guests = get_guests_for_ui()
-    return jsonify({"success": True, "guests": guests}), 200
+    return conditional_json(household_etag("guests_list"), lambda: (
+        {"success": True, "guests": get_guests_for_ui(), "version": household_version()}, 200
+    ))
     
 
 @app.route("/api/update_guests", methods=["POST"])
@@ -539,22 +1924,18 @@ def update_guests():
 
         guest_list = payload["Details"].get("guests", [])
 
+        ticket, mqtt_status = publish_event(payload, wait=_requested_wait())
+        if ticket is None:
+            return jsonify({"success": False, "error": "Offline and cannot queue update"}), 503
+
         # THIS LINE FIXES EVERYTHING
         save_guests_data(guest_list)  # ← Saves to db
 
-        payload_json = json.dumps(payload)
-
-        publish_ok = False
-        if client and client.is_connected():
-            publish_ok = wait_for_publish_success(client, payload_json, timeout=8.0)
-
-        if not publish_ok:
-            _enqueue(payload)
-
         return jsonify({
             "success": True,
             "guest_count": len(guest_list),
-            "mqtt_status": "sent" if publish_ok else "queued"
+            "mqtt_status": mqtt_status,
+            "publish_ticket": ticket
         }), 200
 
     except Exception as e:
@@ -571,31 +1952,12 @@ def sync_guests():
 
         guest_list = data["guests"]
 
-        # Build MQTT payload
-        payload = {
-            "DEVICE_ID": METER_ID,
-            "TS": str(int(time.time())),
-            "Type": 4,
-            "Details": {
-                "guests": [
-                    {"age": g["age"], "gender": g["gender"], "active": True}
-                    for g in guest_list
-                ]
-            }
-        }
+        payload = guest_event_json(guest_list)
 
-        payload_json = json.dumps(payload)
         _mqtt_log(f"SYNC GUESTS → {len(guest_list)} guests")
 
-        publish_ok = False
-        if client and client.is_connected():
-            publish_ok = wait_for_publish_success(client, payload_json, timeout=8.0)
-
-        if not publish_ok:
-            _enqueue(payload)
-            publish_ok = True
-
-        if not publish_ok:
+        ticket, mqtt_status = publish_event(payload, wait=_requested_wait())
+        if ticket is None:
             return jsonify({"success": False, "error": "Cannot sync"}), 503
 
         # Save guests to db
@@ -603,7 +1965,9 @@ def sync_guests():
 
         return jsonify({
             "success": True,
-            "guest_count": len(guest_list)
+            "guest_count": len(guest_list),
+            "mqtt_status": mqtt_status,
+            "publish_ticket": ticket
         }), 200
 
     except Exception as e:
@@ -613,91 +1977,601 @@ def sync_guests():
 
 @app.route("/api/get_guests", methods=["GET"])
 def get_guests():
-    guests = load_guests_data()
-    return jsonify({
-        "success": True,
-        "guests": guests,
-        "count": len(guests)
-    }), 200
+    def build():
+        guests = load_guests_data()
+        return {
+            "success": True,
+            "guests": guests,
+            "count": len(guests),
+            "version": household_version()
+        }, 200
+    return conditional_json(household_etag("guests"), build)
 
 # === GUESTS ARE NOW STORED IN DB ===
 def load_guests_data():
-    """Load only guests from the db"""
+    """Load only guests — from the household cache, the db on a miss"""
+    global _hh_guests
     try:
-        hhid = load_hhid()
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT age, gender, active
-                FROM guests WHERE meter_id = ? AND hhid = ?
-            """, (METER_ID, hhid))
-            guests = []
-            for row in cur.fetchall():
-                guests.append({
-                    "age": row[0],
-                    "gender": row[1],
-                    "active": bool(row[2])
-                })
-            return guests
+        with _hh_lock:
+            if _hh_guests is None:
+                hhid = load_hhid()
+                with db_conn() as conn:
+                    cur = conn.cursor()
+                    cur.execute("""
+                        SELECT age, gender, active
+                        FROM guests WHERE meter_id = ? AND hhid = ? ORDER BY id
+                    """, (METER_ID, hhid))
+                    guests = []
+                    for row in cur.fetchall():
+                        guests.append({
+                            "age": row[0],
+                            "gender": row[1],
+                            "active": bool(row[2])
+                        })
+                _hh_guests = guests
+            return [dict(g) for g in _hh_guests]
     except Exception as e:
         print(f"[GUESTS] Load error: {e}")
         return []
 
-def save_guests_data(guest_list):
-    """Save guests to the db"""
-    try:
-        hhid = load_hhid()
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM guests WHERE meter_id = ? AND hhid = ?", (METER_ID, hhid))
-            for g in guest_list:
-                cur.execute("""
-                    INSERT INTO guests (meter_id, hhid, age, gender, active)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (METER_ID, hhid, g.get("age"), g.get("gender"), int(g.get("active", True))))
-            conn.commit()
-        print(f"[GUESTS] Saved {len(guest_list)} guests → db")
-    except Exception as e:
-        print(f"[GUESTS] Save failed: {e}")
-        raise
+def save_guests_data(guest_list):
+    """Save guests to the db (and the household cache)"""
+    global _hh_version, _hh_guests
+    try:
+        with _hh_lock, db_conn() as conn:
+            hhid = load_hhid()
+            # Guests have no natural key: pair incoming and stored rows by
+            # position and only touch the ones that differ.
+            stored = conn.execute("""
+                SELECT id, age, gender, active
+                FROM guests WHERE meter_id = ? AND hhid = ? ORDER BY id
+            """, (METER_ID, hhid)).fetchall()
+            wanted = [(g.get("age"), g.get("gender"), int(g.get("active", True))) for g in guest_list]
+
+            updates = [w + (row[0],) for row, w in zip(stored, wanted) if tuple(row[1:]) != w]
+            deletes = [(row[0],) for row in stored[len(wanted):]]
+            inserts = [(METER_ID, hhid) + w for w in wanted[len(stored):]]
+
+            conn.executemany("DELETE FROM guests WHERE id = ?", deletes)
+            conn.executemany("UPDATE guests SET age = ?, gender = ?, active = ? WHERE id = ?", updates)
+            conn.executemany("""
+                INSERT INTO guests (meter_id, hhid, age, gender, active)
+                VALUES (?, ?, ?, ?, ?)
+            """, inserts)
+            conn.commit()
+            _hh_guests = [
+                {"age": g.get("age"), "gender": g.get("gender"), "active": bool(g.get("active", True))}
+                for g in guest_list
+            ]
+            _hh_version += 1
+        print(f"[GUESTS] Saved {len(guest_list)} guests → db")
+        emit_household(members=False)
+    except Exception as e:
+        print(f"[GUESTS] Save failed: {e}")
+        raise
+
+# ----------------------------------------------------------------------
+# HTTP caching – ETags, compression and cache headers
+# ----------------------------------------------------------------------
+# Static files carry a content-hash ETag, and url_for() appends ?v=<hash>.
+# A request with the current hash may be cached for a year; anything
+# else revalidates (304 while unchanged). Text assets are precompressed
+# once into STATIC_CACHE_DIR and picked by Accept-Encoding. Other JSON
+# and HTML bodies are compressed on the fly. Household JSON gets an ETag
+# from household_version(), so an unchanged roster costs a 304.
+STATIC_CACHE_DIR       = "/var/cache/apm-static"
+STATIC_COMPRESSIBLE    = {".svg", ".css", ".js", ".html", ".json", ".txt"}
+STATIC_MAX_AGE         = 365 * 24 * 3600    # fingerprinted URLs never change
+COMPRESS_MIN_BYTES     = 1024
+GZIP_LEVEL_STATIC      = 9
+GZIP_LEVEL_DYNAMIC     = 5
+BROTLI_QUALITY_STATIC  = 11
+BROTLI_QUALITY_DYNAMIC = 4
+
+_ENCODINGS    = (("br", ".br"), ("gzip", ".gz"))   # preference order
+_ETAG_EPOCH   = format(int(APP_START), "x")       # household versions restart with the process
+_static_lock  = threading.Lock()
+_static_index = {}    # filename -> (mtime_ns, size, hash)
+
+def _encode(data: bytes, encoding: str, static: bool) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY_STATIC if static else BROTLI_QUALITY_DYNAMIC)
+    return gzip.compress(data, GZIP_LEVEL_STATIC if static else GZIP_LEVEL_DYNAMIC, mtime=0)
+
+def _accepted_encodings() -> list:
+    return [enc for enc, _ in _ENCODINGS
+            if request.accept_encodings[enc] and (enc != "br" or brotli is not None)]
+
+def static_hash(filename: str):
+    """Content hash of a static file, recomputed only when it changes on disk."""
+    path = safe_join(app.static_folder, filename)
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    with _static_lock:
+        cached = _static_index.get(filename)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    digest = h.hexdigest()[:16]
+    with _static_lock:
+        _static_index[filename] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+def _variant_fresh(src: str, variant: str) -> bool:
+    try:
+        return os.stat(variant).st_mtime_ns >= os.stat(src).st_mtime_ns
+    except OSError:
+        return False
+
+def precompress_static():
+    """Builds missing or stale .br/.gz variants of the text assets."""
+    built = 0
+    for root, _, files in os.walk(app.static_folder):
+        for name in files:
+            if os.path.splitext(name)[1] not in STATIC_COMPRESSIBLE:
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, app.static_folder)
+            for encoding, suffix in _ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                variant = os.path.join(STATIC_CACHE_DIR, rel + suffix)
+                if _variant_fresh(src, variant):
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(variant), exist_ok=True)
+                    with open(src, "rb") as f:
+                        data = _encode(f.read(), encoding, static=True)
+                    with open(variant + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(variant + ".tmp", variant)
+                    built += 1
+                except OSError as e:
+                    print(f"[STATIC] Cannot precompress {rel}: {e}")
+                    return
+    print(f"[STATIC] {built} precompressed variant(s) built in {STATIC_CACHE_DIR}")
+
+def serve_static(filename):
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    digest = static_hash(filename)
+    served, encoding = path, None
+    compressible = os.path.splitext(filename)[1] in STATIC_COMPRESSIBLE
+    if compressible:
+        for enc in _accepted_encodings():
+            variant = os.path.join(STATIC_CACHE_DIR, filename + dict(_ENCODINGS)[enc])
+            if _variant_fresh(path, variant):
+                served, encoding = variant, enc
+                break
+
+    resp = send_file(served, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                     etag=f"{digest}-{encoding}" if encoding else digest, conditional=True)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    if compressible:
+        resp.vary.add("Accept-Encoding")
+    if request.args.get("v") == digest:
+        resp.cache_control.no_cache = None
+        resp.cache_control.public = True
+        resp.cache_control.max_age = STATIC_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+app.view_functions["static"] = serve_static
+
+@app.url_defaults
+def _fingerprint_static(endpoint, values):
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        digest = static_hash(values["filename"])
+        if digest:
+            values["v"] = digest
+
+@app.after_request
+def _compress_response(resp):
+    if (resp.direct_passthrough or resp.is_streamed or resp.status_code != 200
+            or "Content-Encoding" in resp.headers
+            or resp.mimetype not in ("application/json", "text/html")):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    data = resp.get_data()
+    encodings = _accepted_encodings()
+    if len(data) < COMPRESS_MIN_BYTES or not encodings:
+        return resp
+    resp.set_data(_encode(data, encodings[0], static=False))
+    resp.headers["Content-Encoding"] = encodings[0]
+    return resp
+
+ASSET_MANIFEST_PATH = os.path.join(app.static_folder, "build", "manifest.json")
+
+_manifest_lock  = threading.Lock()
+_manifest_cache = (None, {})    # (mtime_ns, parsed manifest)
+
+def asset_manifest() -> dict:
+    """static/build/manifest.json (see build_assets.py); {} if it was never built."""
+    global _manifest_cache
+    try:
+        mtime = os.stat(ASSET_MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    with _manifest_lock:
+        if _manifest_cache[0] != mtime:
+            try:
+                with open(ASSET_MANIFEST_PATH) as f:
+                    _manifest_cache = (mtime, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[STATIC] Bad asset manifest: {e}")
+                _manifest_cache = (mtime, {})
+        return _manifest_cache[1]
+
+def asset_manifest_urls() -> dict:
+    """The manifest with every file path turned into its static URL (request context)."""
+    def resolve(entry):
+        return {k: url_for("static", filename=v) if k in ("webp", "png", "svg", "css", "js", "woff2") else v
+                for k, v in entry.items()}
+    return {group: {key: resolve(entry) for key, entry in entries.items()}
+            for group, entries in asset_manifest().items()}
+
+
+def household_etag(kind: str) -> str:
+    return f"{kind}-{_ETAG_EPOCH}-{household_version()}"
+
+def conditional_json(tag: str, build):
+    """
+    build() -> (body, status). Answers 304 without calling it when the
+    client already holds tag; successful bodies are sent with the tag.
+    """
+    if request.if_none_match.contains_weak(tag):
+        resp = Response(status=304)
+    else:
+        body, status = build()
+        resp = jsonify(body)
+        resp.status_code = status
+        if status != 200:
+            return resp
+    resp.set_etag(tag, weak=True)
+    resp.cache_control.no_cache = True
+    return resp
+
+
+def index_bundle():
+    """The minified JS/CSS bundle, or None if missing or older than its sources."""
+    bundle = asset_manifest().get("bundle", {}).get("app")
+    if not bundle:
+        return None
+    for key, filename in (("css", "css/style.css"), ("js", "js/script.js")):
+        if not (static_hash(filename) or "").startswith(bundle.get("sources", {}).get(key) or "-"):
+            return None
+    return bundle
+
+
+# The page only changes with a rebuild or an edited source, so it is
+# rendered once, compressed once and then served from memory.
+_index_lock  = threading.Lock()
+_index_cache = (None, None)    # (key, {"etag": ..., None|"gzip"|"br": body})
+
+def index_page() -> dict:
+    """Rendered index.html with its ETag and compressed bodies (request context)."""
+    global _index_cache
+    manifest = asset_manifest()
+    key = (_manifest_cache[0], static_hash("css/style.css"), static_hash("js/script.js"))
+    with _index_lock:
+        if _index_cache[0] == key:
+            return _index_cache[1]
+
+        urls = asset_manifest_urls()
+        bundle, critical = index_bundle(), ""
+        if bundle:
+            try:
+                with open(os.path.join(app.static_folder, bundle["critical"]), encoding="utf-8") as f:
+                    critical = f.read()
+            except OSError as e:
+                print(f"[STATIC] Critical CSS unreadable, using style.css: {e}")
+                bundle = None
+        if not bundle:
+            urls.pop("bundle", None)
+            if manifest.get("bundle"):
+                print("[STATIC] Asset bundle is older than style.css/script.js – run build_assets.py")
+
+        body = render_template("index.html", asset_manifest=urls, critical_css=critical).encode("utf-8")
+        page = {"etag": hashlib.sha1(body).hexdigest()[:16], None: body}
+        for encoding, _ in _ENCODINGS:
+            if encoding != "br" or brotli is not None:
+                page[encoding] = _encode(body, encoding, static=True)
+        _index_cache = (key, page)
+        print(f"[STATIC] index.html rendered ({len(body)} B, gzip {len(page['gzip'])} B)")
+        return page
+
+def warm_index():
+    with app.test_request_context("/"):
+        index_page()
+
+
+@app.route("/")
+def home():
+    page = index_page()
+    encoding = next(iter(_accepted_encodings()), None)
+    resp = Response(page[encoding], mimetype="text/html")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(f"{page['etag']}-{encoding}" if encoding else page["etag"])
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+
+@app.route("/api/check_installation", methods=["GET"])
+def check_installation():
+    return jsonify({"installed": is_installation_done(), "meter_id": METER_ID})
+
+
+@app.route("/api/check_current_state", methods=["GET"])
+def check_current_state():
+    return jsonify({"current_state": current_state()})
+
+
+@app.route("/api/bootstrap", methods=["GET"])
+def bootstrap():
+    """
+    Everything the UI needs for its first screen in one response, from the
+    in-memory caches. "events" holds the same payloads /api/events pushes,
+    so the client seeds its pushed state from it.
+    """
+    t0 = time.perf_counter()
+    installed = is_installation_done()
+    result = {
+        "success": True,
+        "installed": installed,
+        "meter_id": METER_ID,
+        "current_state": current_state(),
+        "hhid": load_hhid(),
+        "events": {}
+    }
+    events = result["events"]
+    try:
+        with _hh_lock:
+            version = household_version()
+            result["members"] = load_members_data() if installed else None
+            events["guests"] = guests_event(version, load_guests_data())
+        result["version"] = version
+        events["connectivity"] = connectivity_event(get_network_status())
+        events["mqtt"] = {"connected": bool(client and client.is_connected())}
+        if not installed:
+            events["input_sources"] = input_sources_event()
+            events["video_detection"] = read_video_detection()
+    except Exception as e:
+        print(f"[BOOT] Bootstrap partial: {e}")
+    try:
+        events["brightness"] = {"brightness": read_brightness()}
+    except Exception:
+        pass   # no backlight (dev machine)
+    result["server_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return jsonify(result), 200
+
+
+@app.route("/api/boot_metrics", methods=["GET", "POST"])
+def boot_metrics():
+    """
+    POST: time-to-interactive as measured by the UI, logged next to the
+    boot log. GET: every boot milestone, in seconds after process start.
+    """
+    if request.method == "GET":
+        return jsonify({"success": True, "mode": BOOT_MODE, "marks": _boot_marks, "rss_mb": _boot_rss}), 200
+    data = request.get_json(silent=True) or {}
+    tti_ms = data.get("tti_ms")
+    ready_at = data.get("ready_at")   # epoch ms, UI clock
+    since_start = f", {ready_at / 1000 - BOOT_T0:.2f}s after process start" if ready_at else ""
+    print(f"[BOOT] UI interactive ({data.get('screen', '?')}) {tti_ms} ms after page load "
+          f"(bootstrap {data.get('bootstrap_ms')} ms){since_start}")
+    if ready_at:
+        mark_boot("ui_interactive", at=ready_at / 1000)
+    return jsonify({"success": True}), 200
+
+
+# ----------------------------------------------------------------------
+# Network status – one connectivity model fed by `nmcli monitor`
+# ----------------------------------------------------------------------
+# A single long-lived `nmcli monitor` process reports link changes; only
+# then (debounced) is `nmcli connection show --active` run again. The GSM
+# flag comes from the flag watcher. Endpoints read the snapshot; every
+# change is pushed as a "connectivity" event. Without a running monitor
+# the snapshot falls back to a short poll.
+NET_STATUS_POLL    = 300    # safety-net nmcli refresh when no link events arrive
+NET_FALLBACK_POLL  = 5      # nmcli refresh interval while `nmcli monitor` is not running
+NET_EVENT_DEBOUNCE = 0.5    # coalesce bursts of monitor lines into one refresh
+NET_MONITOR_RETRY  = 30     # respawn delay if `nmcli monitor` exits
+
+_net_lock    = threading.Lock()
+_net_status  = None             # latest snapshot (dict, replaced whole)
+_net_dirty   = threading.Event()
+_net_monitor_alive = threading.Event()   # set while `nmcli monitor` is running
+
+def _is_wifi_device(device: str) -> bool:
+    return device.startswith("wlan") or device.startswith("wlx")
+
+def refresh_network_status() -> dict:
+    """Re-read the link state from nmcli now and publish a new snapshot."""
+    ok, out = run_system_command(
+        ["nmcli", "-t", "-f", "NAME,TYPE,DEVICE", "connection", "show", "--active"]
+    )
+    ssid = device = signal = None
+    if ok:
+        for line in out.strip().split("\n"):
+            parts = line.split(":", 2)
+            if len(parts) < 3:
+                continue
+            name, conn_type, dev = parts
+            if conn_type == "802-11-wireless" and _is_wifi_device(dev):
+                ssid, device = name, dev
+                break
+
+    if device:
+        ok_sig, sig_out = run_system_command(
+            ["nmcli", "-t", "-f", "IN-USE,SIGNAL", "device", "wifi", "list", "ifname", device, "--rescan", "no"]
+        )
+        if ok_sig:
+            for line in sig_out.strip().split("\n"):
+                in_use, _, value = line.partition(":")
+                if in_use.strip() == "*" and value.strip().isdigit():
+                    signal = int(value.strip())
+                    break
+
+    status = {
+        "nmcli_ok": ok,
+        "wifi_connected": device is not None,
+        "ssid": ssid,
+        "device": device,
+        "signal": signal,
+        "gsm": flag_exists("gsm_up"),
+        "updated_at": time.time()
+    }
+    _set_network_status(status)
+    return status
+
+def _set_network_status(status: dict):
+    global _net_status
+    with _net_lock:
+        _net_status = status
+    emit_event("connectivity", connectivity_event(status), only_if_changed=True)
+
+def connectivity_event(status: dict) -> dict:
+    return {
+        "wifi_connected": status["wifi_connected"],
+        "ssid": status["ssid"],
+        "signal": status["signal"],
+        "gsm": status["gsm"]
+    }
+
+def _net_set_gsm(gsm: bool):
+    with _net_lock:
+        current = _net_status
+    if current is not None and current["gsm"] != gsm:
+        _set_network_status(dict(current, gsm=gsm))
+
+def _net_monitor_worker():
+    """Turns every `nmcli monitor` line into a refresh request."""
+    while True:
+        try:
+            proc = subprocess.Popen(["nmcli", "monitor"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True)
+            _net_monitor_alive.set()
+            for _ in proc.stdout:
+                _net_dirty.set()
+            proc.wait()
+            print(f"[NET] nmcli monitor exited (rc={proc.returncode})")
+        except Exception as e:
+            print(f"[NET] nmcli monitor unavailable: {e}")
+        # Refresh now and keep polling every NET_FALLBACK_POLL until it is back
+        _net_monitor_alive.clear()
+        _net_dirty.set()
+        time.sleep(NET_MONITOR_RETRY)
+
+def _net_refresh_worker():
+    while True:
+        poll = NET_STATUS_POLL if _net_monitor_alive.is_set() else NET_FALLBACK_POLL
+        if _net_dirty.wait(timeout=poll):
+            time.sleep(NET_EVENT_DEBOUNCE)
+            _net_dirty.clear()
+        refresh_network_status()
 
-@app.route("/")
-def home():
-    return render_template("index.html")
+def get_network_status() -> dict:
+    """Current connectivity snapshot; starts the monitors on first use."""
+    start_state_watchers()
+    with _net_lock:
+        status = _net_status
+    return status if status is not None else refresh_network_status()
 
 
-@app.route("/api/check_installation", methods=["GET"])
-def check_installation():
-    return jsonify({"installed": is_installation_done(), "meter_id": METER_ID})
+# ----------------------------------------------------------------------
+# Hardware flags – read from the flag snapshot, pushed as events
+# ----------------------------------------------------------------------
+_watch_lock    = threading.Lock()
+_watch_started = False
+
+def read_input_sources() -> list:
+    sources = []
+    if flag_exists("jack_status"):
+        sources.append("line_in")
+    if flag_exists("hdmi_input"):
+        sources.append("HDMI")
+    return sources
+
+def read_video_detection() -> dict:
+    entry = get_flag("video_detection")
+    if not entry["exists"]:
+        return {"success": True, "detected": False, "status": "not_running"}
+    if entry["content"] is None:
+        return {"success": False, "error": "Failed to read video_detection"}
+    return {"success": True, "detected": True, "status": entry["content"] or "active"}
+
+def input_sources_event() -> dict:
+    sources = read_input_sources()
+    return {"success": bool(sources), "sources": sources}
+
+def _push_flag_change(name: str, entry: dict):
+    if name in ("jack_status", "hdmi_input"):
+        emit_event("input_sources", input_sources_event(), only_if_changed=True)
+    elif name == "video_detection":
+        emit_event("video_detection", read_video_detection(), only_if_changed=True)
+    elif name == "gsm_up":
+        _net_set_gsm(entry["exists"])
+
+subscribe_flags(_push_flag_change)
+
+def start_state_watchers():
+    """Starts the flag watcher, link monitor and nmcli refresher once."""
+    global _watch_started
+    with _watch_lock:
+        if _watch_started:
+            return
+        _watch_started = True
+    start_flag_watcher()
+    for target in (_net_monitor_worker, _net_refresh_worker):
+        threading.Thread(target=target, daemon=True).start()
 
 
-@app.route("/api/check_current_state", methods=["GET"])
-def check_current_state():
-    return jsonify({"current_state": current_state()})
+@app.route("/api/events", methods=["GET"])
+def event_stream():
+    """
+    Server-sent events: connectivity, input_sources, video_detection,
+    members, guests, mqtt and brightness. The current state of each kind
+    is sent first, then every change as it happens.
+    """
+    get_network_status()   # starts the watchers, seeds "connectivity"
+    q = _events_subscribe()
+    emit_household()       # refreshes the roster snapshot if it went stale
+
+    def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            while True:
+                try:
+                    frame = q.get(timeout=EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            _events_unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route("/api/check_wifi", methods=["GET"])
 def check_wifi():
     set_current_state("connect_select")
     try:
-        ok, out = run_system_command(
-            ["nmcli", "-t", "-f", "TYPE,DEVICE", "connection", "show", "--active"]
-        )
-        if not ok:
-            return jsonify({"success": False}), 200
-
-        for line in out.strip().split("\n"):
-            if not line.strip():
-                continue
-            parts = line.split(":", 1)
-            if len(parts) < 2:
-                continue
-            conn_type, device = parts[0], parts[1]
-
-            if conn_type == "802-11-wireless" and (device.startswith("wlan") or device.startswith("wlx")):
-                return jsonify({"success": True}), 200
-
-        return jsonify({"success": False}), 200
+        return jsonify({"success": get_network_status()["wifi_connected"]}), 200
     except Exception:
         return jsonify({"success": False}), 200
 
@@ -705,24 +2579,16 @@ def check_wifi():
 @app.route("/api/current_wifi", methods=["GET"])
 def current_wifi():
     try:
-        ok, out = run_system_command(
-            ["nmcli", "-t", "-f", "NAME,TYPE,DEVICE", "connection", "show", "--active"]
-        )
-        if not ok:
+        status = get_network_status()
+        if not status["nmcli_ok"]:
             return jsonify({"success": False, "error": "nmcli failed"}), 500
-
-        for line in out.strip().split("\n"):
-            if not line.strip():
-                continue
-            parts = line.split(":", 2)
-            if len(parts) < 3:
-                continue
-
-            name, conn_type, device = parts[0], parts[1], parts[2]
-
-            if conn_type == "802-11-wireless" and (device.startswith("wlan") or device.startswith("wlx")):
-                return jsonify({"success": True, "ssid": name}), 200
-
+        if status["wifi_connected"]:
+            return jsonify({
+                "success": True,
+                "ssid": status["ssid"],
+                "device": status["device"],
+                "signal": status["signal"]
+            }), 200
         return jsonify({"success": False, "error": "No active Wi-Fi connection"}), 404
 
     except Exception as e:
@@ -769,6 +2635,7 @@ def wifi_connect():
             }), 500
 
         print(f"[WiFi] Successfully connected to {ssid}")
+        refresh_network_status()   # the UI asks /api/current_wifi right after this
 
         # Step 3: Create /run/wifi_network_up file using sudo tee
         try:
@@ -809,6 +2676,7 @@ def wifi_connect():
 def wifi_disconnect():
     try:
         run_system_command(["sudo", "nmcli", "device", "disconnect", "wlan0"])
+        refresh_network_status()
         # if os.path.exists(SYSTEM_FILES["wifi_up"]):
         #     os.remove(SYSTEM_FILES["wifi_up"])
         return jsonify({"success": True, "message": "Disconnected"}), 200
@@ -834,120 +2702,249 @@ def run_system_command(cmd):
         return False, str(e)
 
 
-@app.route("/api/wifi/networks", methods=["GET"])
-def list_wifi_networks():
+# ----------------------------------------------------------------------
+# Wi-Fi scan service – one background scanner, stale-while-revalidate
+# ----------------------------------------------------------------------
+WIFI_SCAN_INTERVAL   = 30     # seconds between background rescans
+WIFI_SCAN_SETTLE     = 2.5    # radio needs this long after `rescan` before listing
+WIFI_SCAN_IDLE_AFTER = 120    # stop rescanning this long after the last request
+WIFI_FRESH_TIMEOUT   = 15     # max wait for ?fresh=1
+
+_wifi_scan_cond    = threading.Condition()
+_wifi_scan_result  = None     # list of available networks from the last good scan
+_wifi_scan_at      = 0.0      # when that scan finished
+_wifi_scan_gen     = 0        # bumped after every scan attempt
+_wifi_scan_error   = None
+_wifi_scan_busy    = False    # a scan is in flight; new requests join it
+_wifi_scan_wanted  = 0.0      # last time anyone asked for scan results
+_wifi_scan_kick    = threading.Event()
+_wifi_scanner      = None
+
+def _scan_available_networks() -> list:
+    """Rescan the radio and parse `nmcli device wifi list`. Raises on failure."""
+    print("[WiFi] Rescanning networks...")
+    run_system_command(["sudo", "nmcli", "device", "wifi", "rescan"])
+    time.sleep(WIFI_SCAN_SETTLE)  # Give time for scan
+
+    ok, out = run_system_command([
+        "nmcli", "-t", "-f", "SSID,SIGNAL,SECURITY", "device", "wifi", "list"
+    ])
+    if not ok:
+        raise RuntimeError("Failed to scan networks")
+
+    available = []
+    seen_ssids = set()
+    for line in out.strip().split("\n"):
+        if not line.strip():
+            continue
+        parts = line.split(":", 2)  # Only split on first two colons
+        if len(parts) < 3 or not parts[0].strip():
+            continue
+
+        ssid = parts[0].strip()
+        if ssid in seen_ssids:
+            continue  # Avoid duplicates from nmcli
+        seen_ssids.add(ssid)
+
+        signal = parts[1].strip()
+        security = parts[2].strip() if parts[2].strip() else "Open"
+
+        available.append({
+            "ssid": ssid,
+            "signal_strength": f"{signal}%",
+            "security": security,
+            "saved": False,
+            "password": None
+        })
+    return available
+
+def _wifi_scanner_worker():
+    """Rescans every WIFI_SCAN_INTERVAL while someone is looking, or when kicked."""
+    global _wifi_scan_result, _wifi_scan_at, _wifi_scan_gen, _wifi_scan_error, _wifi_scan_busy
+    while True:
+        _wifi_scan_kick.wait(timeout=WIFI_SCAN_INTERVAL)
+        _wifi_scan_kick.clear()
+        if time.time() - _wifi_scan_wanted > WIFI_SCAN_IDLE_AFTER:
+            continue   # nobody has the Wi-Fi screen open — leave the radio alone
+        with _wifi_scan_cond:
+            _wifi_scan_busy = True
+        try:
+            networks, error = _scan_available_networks(), None
+        except Exception as e:
+            networks, error = None, str(e)
+            print(f"[WiFi] Background scan failed: {e}")
+        with _wifi_scan_cond:
+            if networks is not None:
+                _wifi_scan_result, _wifi_scan_at = networks, time.time()
+            _wifi_scan_error = error
+            _wifi_scan_busy = False
+            _wifi_scan_gen += 1
+            _wifi_scan_cond.notify_all()
+
+def get_wifi_scan(fresh: bool = False) -> Tuple[list, float]:
     """
-    Returns available + saved Wi-Fi networks (merged, no duplicates).
-    Includes passwords for saved networks (requires sudo).
-    Logs everything to console.
+    Latest available-network list and its timestamp. Returns the cached scan
+    immediately (and triggers a refresh in the background); waits for the
+    next scan only if fresh=True or nothing has been scanned yet. All waiters
+    share the single in-flight scan.
     """
+    global _wifi_scan_wanted, _wifi_scanner
+    with _wifi_scan_cond:
+        _wifi_scan_wanted = time.time()
+        if _wifi_scanner is None:
+            _wifi_scanner = threading.Thread(target=_wifi_scanner_worker, daemon=True)
+            _wifi_scanner.start()
+        if not _wifi_scan_busy and (fresh or time.time() - _wifi_scan_at >= WIFI_SCAN_INTERVAL):
+            _wifi_scan_kick.set()
+        if fresh or _wifi_scan_result is None:
+            target = _wifi_scan_gen + 1
+            if not _wifi_scan_cond.wait_for(lambda: _wifi_scan_gen >= target, timeout=WIFI_FRESH_TIMEOUT):
+                raise RuntimeError("Timed out waiting for Wi-Fi scan")
+            if _wifi_scan_result is None:
+                raise RuntimeError(_wifi_scan_error or "Failed to scan networks")
+        return [dict(n) for n in _wifi_scan_result], _wifi_scan_at
+
+
+# ----------------------------------------------------------------------
+# Saved Wi-Fi profiles – NetworkManager keyfiles indexed by name + mtime
+# ----------------------------------------------------------------------
+NM_CONNECTIONS_DIR = "/etc/NetworkManager/system-connections"
+
+_saved_lock      = threading.Lock()
+_saved_index     = {}     # keyfile name → (mtime string, parsed profile or None)
+_saved_dir_mtime = None   # st_mtime_ns of NM_CONNECTIONS_DIR when last indexed
+
+def _parse_saved_profile(filename: str, content: str):
+    """Parsed SSID / key-mgmt / password of one keyfile, or None if it isn't Wi-Fi."""
+    parser = configparser.RawConfigParser()
     try:
-        # === 1. Rescan and list available networks ===
-        print("[WiFi] Rescanning networks...")
-        run_system_command(["sudo", "nmcli", "device", "wifi", "rescan"])
-        time.sleep(2.5)  # Give time for scan
-
-        ok, out = run_system_command([
-            "nmcli", "-t", "-f", "SSID,SIGNAL,SECURITY", "device", "wifi", "list"
-        ])
-        if not ok:
-            return jsonify({"success": False, "error": "Failed to scan networks"}), 500
+        # Parse INI content from string
+        parser.read_string(content, source=filename)
+    except Exception as e:
+        print(f"[WiFi] Failed to parse {filename}: {e}")
+        return None
 
-        available = []
-        seen_ssids = set()
-        for line in out.strip().split("\n"):
-            if not line.strip():
-                continue
-            parts = line.split(":", 2)  # Only split on first two colons
-            if len(parts) < 3 or not parts[0].strip():
-                continue
+    def safe_get(section, key):
+        try:
+            return parser.get(section, key)
+        except:
+            return None
+
+    ssid = (
+        safe_get("wifi", "ssid") or
+        safe_get("802-11-wireless", "ssid") or
+        safe_get("connection", "id")
+    )
+    if not ssid:
+        return None
+    ssid = ssid.strip().strip('"').strip("'")
 
-            ssid = parts[0].strip()
-            if ssid in seen_ssids:
-                continue  # Avoid duplicates from nmcli
-            seen_ssids.add(ssid)
+    key_mgmt = (
+        safe_get("wifi-security", "key-mgmt") or
+        safe_get("802-11-wireless-security", "key-mgmt") or
+        "none"
+    ).lower()
 
-            signal = parts[1].strip()
-            security = parts[2].strip() if parts[2].strip() else "Open"
+    password = None
+    if key_mgmt in ["wpa-psk", "wpa-eap"]:
+        password = safe_get("wifi-security", "psk")
+    elif key_mgmt == "none":
+        password = ""  # Open or WEP might use different keys
 
-            available.append({
-                "ssid": ssid,
-                "signal_strength": f"{signal}%",
-                "security": security,
-                "saved": False,
-                "password": None
-            })
+    return {"ssid": ssid, "key_mgmt": key_mgmt, "password": password}
+
+def _read_saved_keyfiles():
+    """
+    One privileged read of every keyfile: find prints a NUL-terminated
+    "mtime path" record per file, then a single `tail` dumps them all, each
+    behind its "==> path <==" header. Returns [(name, mtime, content)] or
+    None on failure.
+    """
+    ok, out = run_system_command([
+        "sudo", "find", NM_CONNECTIONS_DIR, "-maxdepth", "1", "-type", "f",
+        "-printf", "%T@ %p\\0", "-exec", "tail", "-v", "-n", "+1", "--", "{}", "+"
+    ])
+    if not ok:
+        print(f"[WiFi] Failed to read system-connections: {out}")
+        return None
+    # Keyfiles hold no NULs: records end at the last one, tail's output follows
+    split = out.rfind("\0")
+    records = [r.split(" ", 1) for r in out[:split].split("\0")] if split >= 0 else []
+    text = out[split + 1:]
+
+    files, pos = [], 0
+    headers = [("\n" if i else "") + f"==> {path} <==\n" for i, (_, path) in enumerate(records)]
+    for i, (mtime, path) in enumerate(records):
+        start = text.find(headers[i], pos)
+        if start < 0:
+            print(f"[WiFi] No content read for {path}")
+            continue
+        start += len(headers[i])
+        end = text.find(headers[i + 1], start) if i + 1 < len(records) else -1
+        pos = end if end >= 0 else len(text)
+        files.append((os.path.basename(path), mtime, text[start:pos]))
+    return files
 
-        # === 2. Fetch saved connections WITH password (requires sudo) ===
-        nm_dir = Path("/etc/NetworkManager/system-connections")
-        saved = []
+def get_saved_profiles() -> list:
+    """
+    Saved Wi-Fi profiles ({"ssid", "key_mgmt", "password"}). Keyfiles are only
+    re-read when the directory's mtime moves (NetworkManager replaces keyfiles
+    by rename), and only files whose own mtime changed are parsed again.
+    """
+    global _saved_dir_mtime
+    with _saved_lock:
+        try:
+            dir_mtime = os.stat(NM_CONNECTIONS_DIR).st_mtime_ns
+        except FileNotFoundError:
+            print(f"[WiFi] {NM_CONNECTIONS_DIR}/ not found.")
+            _saved_index.clear()
+            _saved_dir_mtime = None
+            return []
+        except OSError:
+            dir_mtime = None   # cannot stat without privileges: always re-read
+
+        if dir_mtime is None or dir_mtime != _saved_dir_mtime:
+            files = _read_saved_keyfiles()
+            if files is not None:
+                fresh = {}
+                for name, mtime, content in files:
+                    cached = _saved_index.get(name)
+                    if cached and cached[0] == mtime:
+                        fresh[name] = cached
+                    else:
+                        fresh[name] = (mtime, _parse_saved_profile(name, content))
+                _saved_index.clear()
+                _saved_index.update(fresh)
+                _saved_dir_mtime = dir_mtime
+
+        return [dict(profile) for _, (_, profile) in sorted(_saved_index.items())
+                if profile is not None]
 
-        if not nm_dir.exists():
-            print("[WiFi] /etc/NetworkManager/system-connections/ not found.")
-        else:
-            # Use sudo to read files
-            try:
-                ok, file_list = run_system_command(["sudo", "ls", str(nm_dir)])
-                if not ok:
-                    print("[WiFi] Failed to list system-connections (ls failed)")
-                else:
-                    for filename in file_list.strip().split("\n"):
-                        if not filename.strip():
-                            continue
-                        file_path = nm_dir / filename
-
-                        # Read file with sudo
-                        ok, content = run_system_command(["sudo", "cat", str(file_path)])
-                        if not ok:
-                            print(f"[WiFi] Failed to read {filename}: {content}")
-                            continue
-
-                        parser = configparser.RawConfigParser()
-                        try:
-                            # Parse INI content from string
-                            from io import StringIO
-                            parser.read_string(content, source=filename)
-                        except Exception as e:
-                            print(f"[WiFi] Failed to parse {filename}: {e}")
-                            continue
-
-                        def safe_get(section, key):
-                            try:
-                                return parser.get(section, key)
-                            except:
-                                return None
-
-                        ssid = (
-                            safe_get("wifi", "ssid") or
-                            safe_get("802-11-wireless", "ssid") or
-                            safe_get("connection", "id")
-                        )
-                        if not ssid:
-                            continue
-                        ssid = ssid.strip().strip('"').strip("'")
-
-                        key_mgmt = (
-                            safe_get("wifi-security", "key-mgmt") or
-                            safe_get("802-11-wireless-security", "key-mgmt") or
-                            "none"
-                        ).lower()
-
-                        password = None
-                        if key_mgmt in ["wpa-psk", "wpa-eap"]:
-                            password = safe_get("wifi-security", "psk")
-                        elif key_mgmt == "none":
-                            password = ""  # Open or WEP might use different keys
-
-                        saved.append({
-                            "ssid": ssid,
-                            "signal_strength": None,
-                            "security": key_mgmt.title().replace("Psk", "PSK").replace("Eap", "EAP"),
-                            "saved": True,
-                            "password": password
-                        })
 
-            except Exception as e:
-                print(f"[WiFi] Error accessing system-connections: {e}")
+@app.route("/api/wifi/networks", methods=["GET"])
+def list_wifi_networks():
+    """
+    Returns available + saved Wi-Fi networks (merged, no duplicates).
+    Includes passwords for saved networks (requires sudo).
+    Available networks come from the background scanner's cache;
+    ?fresh=1 waits for a new scan instead.
+    Logs everything to console.
+    """
+    try:
+        # === 1. Available networks (cached scan) ===
+        try:
+            available, scanned_at = get_wifi_scan(fresh=request.args.get("fresh") == "1")
+        except RuntimeError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+
+        # === 2. Saved connections WITH password (mtime-indexed cache) ===
+        saved = [{
+            "ssid": p["ssid"],
+            "signal_strength": None,
+            "security": p["key_mgmt"].title().replace("Psk", "PSK").replace("Eap", "EAP"),
+            "saved": True,
+            "password": p["password"]
+        } for p in get_saved_profiles()]
 
         # === Debug: Print saved networks ===
         print("\n[WiFi SAVED NETWORKS] ======================")
@@ -989,7 +2986,8 @@ def list_wifi_networks():
         result = sorted(merged.values(), key=sort_key)
 
         # === 5. Final response (mask password in logs for safety) ===
-        response = {"success": True, "networks": result}
+        response = {"success": True, "networks": result,
+                    "scanned_at": int(scanned_at), "age_s": round(time.time() - scanned_at, 1)}
 
         print("[WiFi API RESPONSE] ========================")
         log_response = {"success": True, "networks": [
@@ -1009,7 +3007,7 @@ def list_wifi_networks():
 
 @app.route("/api/check_gsm", methods=["GET"])
 def check_gsm():
-    if (os.path.exists(SYSTEM_FILES["gsm_up"])):
+    if get_network_status()["gsm"]:
         set_current_state("connect_select")
         return jsonify({"success": True})
     return jsonify({"success": False})
@@ -1036,50 +3034,68 @@ def restart():
 @app.route("/api/submit_hhid", methods=["POST"])
 def submit_hhid():
     set_current_state("hhid_input")
-    hhid = request.json.get("hhid")
+    body = request_object()
+    if body is None:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+    hhid = body.get("hhid")
     if not hhid:
         return jsonify({"success": False, "error": "HHID required"}), 400
 
     save_hhid(hhid)
-    try:
-        payload = {"meter_id": METER_ID, "hhid": hhid}
-        resp = requests.post(INITIATE_URL, json=payload, timeout=30)
-        data = resp.json()
-        set_current_state("otp_verification")
-        return jsonify({"success": data.get("success", False)}), 200
-    except requests.exceptions.Timeout:
-        return jsonify({"success": False, "error": "Timeout"}), 504
-    except requests.exceptions.ConnectionError as e:
-        # Handles "Max retries exceeded" and other connection-related issues (common with AWS endpoints)
-        return jsonify({"success": False, "error": "Connection failed: please try again later"}), 503
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+
+    def work():
+        try:
+            payload = {"meter_id": METER_ID, "hhid": hhid}
+            data = cloud_json(cloud_request("initiate", "POST", INITIATE_URL, json=payload))
+            set_current_state("otp_verification")
+            return {"success": data.get("success", False)}, 200
+        except Exception as e:
+            return cloud_failure(e)
+
+    return run_cloud_work("submit_hhid", work)
 
 
 @app.route("/api/submit_otp", methods=["POST"])
 def submit_otp():
-    data = request.json
+    data = request_object()
+    if data is None:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
     meter_id = data.get("meter_id") or METER_ID
     hhid = data.get("hhid")
     otp = data.get("otp")
     if not all([meter_id, hhid, otp]):
         return jsonify({"success": False, "error": "meter_id, hhid, otp required"}), 400
 
-    try:
-        payload = {"meter_id": meter_id, "hhid": hhid, "otp": otp}
-        resp = requests.post(VERIFY_URL, json=payload, timeout=30)
-        result = resp.json()
-        if result.get("success"):
-            save_hhid(hhid)
-            set_current_state("input_source_detection")
-        return jsonify({"success": result.get("success", False)}), 200
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+    def work():
+        try:
+            payload = {"meter_id": meter_id, "hhid": hhid, "otp": otp}
+            result = cloud_json(cloud_request("verify", "POST", VERIFY_URL, json=payload))
+            if result.get("success"):
+                save_hhid(hhid)
+                start_roster_prefetch(hhid)
+                set_current_state("input_source_detection")
+            return {"success": result.get("success", False)}, 200
+        except Exception as e:
+            return cloud_failure(e)
+
+    return run_cloud_work("submit_otp", work)
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify({"success": True, **job}), 200
+
+
+@app.route("/api/cloud_stats", methods=["GET"])
+def get_cloud_stats():
+    return jsonify({"success": True, "endpoints": cloud_stats()}), 200
 
 
 @app.route("/api/input_sources", methods=["GET"])
 def get_input_sources():
-    sources = []
     errors = []
 
     # set_current_state("input_source_detection")
@@ -1097,11 +3113,7 @@ def get_input_sources():
     #     except Exception as e:
     #         errors.append(f"Error reading jack_status: {str(e)}")
 
-    if os.path.exists(SYSTEM_FILES["jack_status"]):
-        sources.append("line_in")
-
-    if os.path.exists(SYSTEM_FILES["hdmi_input"]):
-        sources.append("HDMI")
+    sources = read_input_sources()
 
     if not sources and not errors:
         return jsonify({
@@ -1120,254 +3132,159 @@ def get_input_sources():
 @app.route("/api/video_detection", methods=["GET"])
 def check_video_detection():
     set_current_state("video_object_detection")
-    if os.path.exists(SYSTEM_FILES["video_detection"]):
-        try:
-            content = open(SYSTEM_FILES["video_detection"]).read().strip()
-            return jsonify({
-                "success": True,
-                "detected": True,
-                "status": content or "active"
-            }), 200
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "error": f"Failed to read video_detection: {str(e)}"
-            }), 500
-    else:
-        return jsonify({
-            "success": True,
-            "detected": False,
-            "status": "not_running"
-        }), 200
+    result = read_video_detection()
+    return jsonify(result), 200 if result["success"] else 500
 
 
 @app.route("/api/members", methods=["GET"])
 def get_members():
-    try:
-        data = load_members_data()
-        return jsonify({"success": True, "data": data}), 200
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
-
-
+    def build():
+        try:
+            data = load_members_data()
+            return {"success": True, "data": data, "version": household_version()}, 200
+        except Exception as e:
+            return {"success": False, "error": str(e)}, 500
+    return conditional_json(household_etag("members"), build)
 
-# --- Add this helper at the top with other functions ---
-def wait_for_publish_success(client, payload_json: str, timeout: float = 10.0) -> bool:
-    """
-    Attempts to publish synchronously and waits for confirmation.
-    Returns True if mid received and publish callback fired.
-    """
-    if not client or not client.is_connected():
-        return False
 
-    success = False
-    event = threading.Event()
 
-    def on_publish_temp(client_, userdata, mid):
-        nonlocal success
-        success = True
-        event.set()
+@app.route("/api/publish_status/<int:ticket>", methods=["GET"])
+def get_publish_status(ticket):
+    """Delivery state of a ticket returned by a publishing route: "queued", "sent" or "dropped"."""
+    status = publish_status(ticket)
+    if status is None:
+        return jsonify({"success": False, "ticket": ticket, "error": "Unknown ticket"}), 404
+    return jsonify({"success": True, "ticket": ticket, "mqtt_status": status}), 200
 
-    # Temporarily override callback
-    original = client.on_publish
-    client.on_publish = on_publish_temp
 
+@app.route("/api/outbox_status", methods=["GET"])
+def get_outbox_status():
     try:
-        result = client.publish(MQTT_TOPIC, payload_json)
-        if result.rc != mqtt.MQTT_ERR_SUCCESS:
-            return False
-
-        # Wait for on_publish callback
-        event.wait(timeout=timeout)
-        return success
-    finally:
-        client.on_publish = original  # restore
-    return False
-
+        return jsonify({"success": True, "outbox": outbox_stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route("/api/toggle_member_status", methods=["POST"])
-def toggle_member_status():
-    index = request.json.get("index")
-    if not isinstance(index, int):
-        return jsonify({"success": False, "error": "Invalid index"}), 400
 
-    try:
-        data = load_members_data()
-        members = data.get("members", [])
-        if not (0 <= index < len(members)):
-            return jsonify({"success": False, "error": "Index out of range"}), 400
-
-        member = members[index]
-        old_state = member.get("active", False)
-        new_state = not old_state
-
-        # Build full member list with updated state for the toggled member
-        members_payload = []
-        for i, m in enumerate(members):
-            age = calculate_age(m.get("dob"))
-            if age is None:
-                continue  # skip invalid entries
-            members_payload.append({
-                "member_id": m.get("member_code", ""),
-                "age": age,
-                "gender": m["gender"],
-                "active": new_state if i == index else m.get("active", False)
-            })
-
-        payload = {
-            "DEVICE_ID": METER_ID,
-            "TS": str(int(time.time())),
-            "Type": 3,
-            "Details": {
-                "members": members_payload
-            }
-        }
+def _member_code_from_request(body: dict):
+    """member_code from the request; a legacy list index is resolved against the cache."""
+    code = body.get("member_code")
+    if isinstance(code, str) and code:
+        return code
+    index = body.get("index")
+    if isinstance(index, int) and not isinstance(index, bool):
+        members = load_members_data().get("members", [])
+        if 0 <= index < len(members):
+            return members[index]["member_code"]
+    return None
 
-        payload_json = json.dumps(payload)
 
-        _mqtt_log(f"TOGGLING member {index}: {old_state} → {new_state} | Sending full state to MQTT")
+def _expected_version(body: dict):
+    version = body.get("version")
+    return version if isinstance(version, int) and not isinstance(version, bool) else None
 
-        publish_ok = False
 
-        if client and client.is_connected():
-            publish_ok = wait_for_publish_success(client, payload_json, timeout=8.0)
-            _mqtt_log("Direct MQTT publish succeeded" if publish_ok else "Direct publish failed")
+def _set_member_state(body: dict, active, action: str):
+    """Shared body of toggle/set-active: one-row UPDATE, then a Type 3 from the cache."""
+    member_code = _member_code_from_request(body)
+    if not member_code:
+        return jsonify({"success": False, "error": "member_code (or a valid index) required"}), 400
 
-        if not publish_ok:
-            _mqtt_log("Queueing member state update (will send when online)")
-            _enqueue(payload)
-            publish_ok = True  # queued = success for consistency
+    status, member = update_member(member_code, {"active": active}, _expected_version(body))
+    if status == "not_found":
+        return jsonify({"success": False, "error": "Member not found"}), 404
+    if status == "conflict":
+        return jsonify({"success": False, "error": "Member changed, please retry", "member": member}), 409
 
-        if not publish_ok:
-            _mqtt_log("CRITICAL: Failed to publish or queue member toggle!")
-            return jsonify({"success": False, "error": "Offline and cannot queue update"}), 503
+    new_state = member["active"]
+    _mqtt_log(f"{action} member {member_code} → active={new_state} | Sending full state to MQTT")
 
-        # ONLY update local state if MQTT was sent or queued
-        member["active"] = new_state
-        save_members_data(data)
+    ticket, mqtt_status = publish_member_event(wait=_requested_wait())
+    if mqtt_status == "failed":
+        # Could not even queue the event: undo so local state matches the backend
+        update_member(member_code, {"active": not new_state})
+        _mqtt_log("CRITICAL: Failed to publish or queue member update!")
+        return jsonify({"success": False, "error": "Offline and cannot queue update"}), 503
 
-        _mqtt_log(f"Member {index} toggled successfully → active = {new_state}")
+    return jsonify({
+        "success": True,
+        "member": member,
+        "active": new_state,
+        "mqtt_status": mqtt_status,
+        "publish_ticket": ticket
+    }), 200
 
-        return jsonify({
-            "success": True,
-            "member": member,
-            "active": new_state,
-            "mqtt_status": "sent" if client and client.is_connected() else "queued"
-        }), 200
 
+@app.route("/api/toggle_member_status", methods=["POST"])
+def toggle_member_status():
+    """
+    Request:
+      { "member_code": "M1", "version": 3 }    (or legacy { "index": 0 })
+    """
+    try:
+        return _set_member_state(request.json or {}, "toggle", "TOGGLING")
     except Exception as e:
         _mqtt_log(f"ERROR in toggle_member_status: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": "Server error"}), 500
-    index = request.json.get("index")
-    if not isinstance(index, int):
-        return jsonify({"success": False, "error": "Invalid index"}), 400
-
-    try:
-        data = load_members_data()
-        members = data.get("members", [])
-        if not (0 <= index < len(members)):
-            return jsonify({"success": False, "error": "Index out of range"}), 400
-
-        member = members[index]
-        new_active_state = not member.get("active", False)
-
-        # --- Build payload with the NEW intended state ---
-        age = calculate_age(member["dob"])
-        if age is None:
-            return jsonify({"success": False, "error": "Invalid DOB"}), 400
-
-        members_payload = [
-            {
-                "age": calculate_age(m["dob"]),
-                "gender": m["gender"],
-                "active": (i == index and new_active_state) or m.get("active", False)
-            }
-            for i, m in enumerate(members)
-            if calculate_age(m["dob"]) is not None
-        ]
-
-        payload = {
-            "DEVICE_ID": METER_ID,
-            "TS": str(int(time.time())),
-            "Type": 3,
-            "Details": {"members": members_payload}
-        }
 
-        payload_json = json.dumps(payload)
-
-        # --- Try to send via MQTT ---
-        publish_ok = False
-
-        if client and client.is_connected():
-            # Try synchronous publish with confirmation
-            _mqtt_log(f"Attempting direct publish for member toggle (index={index})")
-            publish_ok = wait_for_publish_success(client, payload_json, timeout=8.0)
-
-        if not publish_ok:
-            # Fallback: enqueue (will be sent when reconnected)
-            _mqtt_log("Direct publish failed or not connected → queuing toggle event")
-            _enqueue(payload)  # your existing robust queue
-            publish_ok = True  # we consider queued = acceptable (will eventually sync)
-
-        if not publish_ok:
-            _mqtt_log("MQTT publish failed and could not queue")
-            return jsonify({
-                "success": False,
-                "error": "Failed to send update (offline and queue failed)"
-            }), 503
-
-        # --- ONLY IF PUBLISH/QUEUE SUCCEEDED → update local state ---
-        member["active"] = new_active_state
-        save_members_data(data)
-
-        _mqtt_log(f"Member {index} toggled → active={new_active_state} (MQTT confirmed/queued)")
-
-        return jsonify({
-            "success": True,
-            "member": member,
-            "mqtt_sent": True
-        }), 200
 
+@app.route("/api/set_member_active", methods=["POST"])
+def set_member_active():
+    """
+    Request:
+      { "member_code": "M1", "active": true, "version": 3 }
+    """
+    body = request.json or {}
+    if not isinstance(body.get("active"), bool):
+        return jsonify({"success": False, "error": "active must be true or false"}), 400
+    try:
+        return _set_member_state(body, body["active"], "SETTING")
     except Exception as e:
-        _mqtt_log(f"Error in toggle_member_status: {e}")
+        _mqtt_log(f"ERROR in set_member_active: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"success": False, "error": str(e)}), 500
+        return jsonify({"success": False, "error": "Server error"}), 500
+
 
 @app.route("/api/edit_member_name", methods=["POST"])
 def edit_member_name():
     """
     Request:
-      { "index": 0, "name": "Rahul" }
+      { "member_code": "M1", "name": "Rahul", "version": 3 }    (or legacy "index")
     """
-    idx = request.json.get("index")
-    new_name = request.json.get("name")
-    if not isinstance(idx, int) or not new_name:
-        return jsonify({"success": False, "error": "index and name required"}), 400
+    body = request.json or {}
+    member_code = _member_code_from_request(body)
+    new_name = (body.get("name") or "").strip()
+    if not member_code or not new_name:
+        return jsonify({"success": False, "error": "member_code and name required"}), 400
 
     try:
-        data = load_members_data()
-        members = data.get("members", [])
-        if 0 <= idx < len(members):
-            old_name = members[idx].get("name", members[idx]["member_code"])
-            members[idx]["name"] = new_name.strip()
-
-            save_members_data(data)
-
-            # Optional: publish updated state (recommended)
-            publish_member_event()
+        old_name = next((m.get("name") for m in load_members_data()["members"]
+                         if m["member_code"] == member_code), None)
+        status, member = update_member(member_code, {"name": new_name}, _expected_version(body))
+        if status == "not_found":
+            return jsonify({"success": False, "error": "Member not found"}), 404
+        if status == "conflict":
+            return jsonify({"success": False, "error": "Member changed, please retry", "member": member}), 409
+
+        # Optional: publish updated state (recommended)
+        ticket, mqtt_status = publish_member_event(wait=_requested_wait())
+        if mqtt_status == "failed":
+            # Could not even queue the event: undo so local state matches the backend
+            update_member(member_code, {"name": old_name})
+            _mqtt_log("CRITICAL: Failed to publish or queue member rename!")
+            return jsonify({"success": False, "error": "Offline and cannot queue update"}), 503
 
-            print(f"[MEMBER] Renamed member {idx}: '{old_name}' → '{new_name}'")
+        print(f"[MEMBER] Renamed member {member_code} → '{new_name}'")
 
-            return jsonify({
-                "success": True,
-                "member": members[idx],
-                "message": "Display name updated"
-            }), 200
-        else:
-            return jsonify({"success": False, "error": "Index out of range"}), 400
+        return jsonify({
+            "success": True,
+            "member": member,
+            "message": "Display name updated",
+            "mqtt_status": mqtt_status,
+            "publish_ticket": ticket
+        }), 200
     except Exception as e:
         print(f"[ERROR] edit_member_name: {e}")
         import traceback
@@ -1378,52 +3295,60 @@ def edit_member_name():
 @app.route("/api/finalize", methods=["POST"])
 def finalize():
     set_current_state("finalize")
+    invalidate_household()   # roster is about to be replaced from the server
     hhid = load_hhid()
     if not hhid:
         return jsonify({"success": False, "error": "HHID not found"}), 400
 
-    try:
-        url = f"{MEMBERS_URL}?meterid={METER_ID}&hhid={hhid}"
-        resp = requests.get(url, timeout=30)
-        server_data = resp.json()
-
-        if server_data.get("success"):
-            members = [
-                {
-                    "member_code": m["member_code"],
-                    "dob": m["dob"],
-                    "gender": m["gender"],
-                    "created_at": m.get("created_at"),
-                    "active": False  # default off
+    def work():
+        try:
+            network_error = wait_roster_prefetch(hhid)
+            server_data = load_staged_roster(hhid)
+            if server_data is not None:
+                print(f"[ROSTER] Finalizing with the staged roster for {hhid}")
+            elif network_error is not None:
+                print(f"[ROSTER] Prefetch just failed ({type(network_error).__name__}) – not fetching again")
+                raise network_error
+            else:
+                print(f"[ROSTER] No staged roster for {hhid} – fetching it now")
+                server_data = fetch_roster(hhid)
+
+            if server_data.get("success"):
+                save_data = {
+                    "meter_id": METER_ID,
+                    "hhid": hhid,
+                    "members": roster_members(server_data)
                 }
-                for m in server_data.get("members", [])
-                if all(k in m for k in ["member_code", "dob", "gender"])
-            ]
-            save_data = {
-                "meter_id": METER_ID,
-                "hhid": hhid,
-                "members": members
-            }
-            save_members_data(save_data)
-            set_installation_done()
-            return jsonify({"success": True, "data": server_data}), 200
-        else:
+                save_members_data(save_data)
+                clear_staged_roster(hhid)
+                set_installation_done()
+                return {"success": True, "data": server_data}, 200
+            else:
+                set_installation_done()
+                return {"success": False, "error": server_data.get("message", "Failed")}, 400
+        except Exception as e:
             set_installation_done()
-            return jsonify({"success": False, "error": server_data.get("message", "Failed")}), 400
-    except requests.exceptions.Timeout:
-        set_installation_done()
-        return jsonify({"success": False, "error": "Timeout"}), 504
-    except Exception as e:
-        set_installation_done()
-        return jsonify({"success": False, "error": str(e)}), 500
+            return cloud_failure(e)
+
+    return run_cloud_work("finalize", work)
 
 
 @app.route("/close")
 def close_application():
+    QtCore = sys.modules.get("PyQt5.QtCore")   # only loaded by the kiosk window
+    if QtCore is None:
+        return "No window to close (headless)", 409
     QtCore.QCoreApplication.quit()
     return "Closing..."
 
 
+BACKLIGHT_PATH = "/sys/class/backlight/1-0045"
+
+def read_brightness() -> int:
+    with open(f"{BACKLIGHT_PATH}/brightness") as f:
+        return int(f.read().strip())
+
+
 @app.route("/api/brightness", methods=["POST"])
 def set_brightness():
     """
@@ -1433,7 +3358,7 @@ def set_brightness():
     try:
         data = request.get_json()
         brightness = int(data.get("brightness", 51))
-        path = "/sys/class/backlight/1-0045"
+        path = BACKLIGHT_PATH
 
         # Get maximum brightness
         with open(f"{path}/max_brightness") as f:
@@ -1444,6 +3369,7 @@ def set_brightness():
         os.system(f"echo {brightness} | sudo tee {path}/brightness > /dev/null")
 
         print(f"[BRIGHTNESS] Set to {brightness}")
+        emit_event("brightness", {"brightness": brightness}, only_if_changed=True)
         return jsonify({"success": True, "brightness": brightness}), 200
     except Exception as e:
         print(f"[BRIGHTNESS] Error: {e}")
@@ -1455,10 +3381,7 @@ def get_current_brightness():
     Returns current brightness from /sys/class/backlight/1-0045/brightness
     """
     try:
-        path = "/sys/class/backlight/1-0045"
-        with open(f"{path}/brightness") as f:
-            brightness = int(f.read().strip())
-        return jsonify({"success": True, "brightness": brightness}), 200
+        return jsonify({"success": True, "brightness": read_brightness()}), 200
     except Exception as e:
         print(f"[BRIGHTNESS-GET] Error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
@@ -1468,74 +3391,164 @@ def get_current_brightness():
 # ----------------------------------------------------------------------
 # 8. Flask runner
 # ----------------------------------------------------------------------
+FLASK_HOST = "0.0.0.0"
+FLASK_PORT = 5000
+
 def run_flask():
-    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False, threaded=True)
+    # make_server binds and listens before returning: from here on the UI's
+    # first request is queued by the kernel even if serving has not started
+    try:
+        server = make_server(FLASK_HOST, FLASK_PORT, app, threaded=True)
+    except SystemExit:   # werkzeug exits instead of raising when the port is taken
+        raise OSError(f"port {FLASK_PORT} is already in use") from None
+    _flask_ready.set()
+    mark_boot("flask_listening")
+    server.serve_forever()
 
 
 # ----------------------------------------------------------------------
 # 9. PyQt5 Browser
 # ----------------------------------------------------------------------
-class BrowserWindow(QtWidgets.QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.browser = QWebEngineView()
-        self.setCentralWidget(self.browser)
-        self.setCursor(Qt.BlankCursor)
-        self.showFullScreen()
-
-        # ---------- NEW: BLOCK CONTEXT MENU ----------
-        self.browser.setContextMenuPolicy(Qt.NoContextMenu)   # disables right-click menu
-        # ----------------------------------------------
-
-        self.browser.setZoomFactor(1.0)
-        settings = self.browser.settings()
-        settings.setAttribute(QWebEngineSettings.ShowScrollBars, False)
-        settings.setAttribute(QWebEngineSettings.JavascriptEnabled, True)
-
-        self.browser.setAttribute(Qt.WA_AcceptTouchEvents, False)
-        self.setAttribute(Qt.WA_AcceptTouchEvents, False)
-
-
-        ZOOM_PREVENT_JS = """
-        (function(){
-            var m = document.createElement('meta');
-            m.name = 'viewport';
-            m.content = 'width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no';
-            document.head.appendChild(m);
-            var block = function(e){ e.preventDefault(); };
-            document.addEventListener('gesturestart',  block, {passive:false});
-            document.addEventListener('gesturechange', block, {passive:false});
-            document.addEventListener('gestureend',    block, {passive:false});
-            document.addEventListener('touchmove', function(e){
-                if(e.touches.length>1) e.preventDefault();
-            }, {passive:false});
-            document.addEventListener('wheel', function(e){
-                if(e.ctrlKey) e.preventDefault();
-            }, {passive:false});
-        })();
-        """
-
-        def _inject(ok: bool):
-            if ok:
-                self.browser.page().runJavaScript(ZOOM_PREVENT_JS)
-
-        self.browser.loadFinished.connect(_inject)
-
-        for seq in [QKeySequence.ZoomIn, QKeySequence.ZoomOut, "Ctrl+=", "Ctrl+-", "Ctrl+0"]:
-            QShortcut(QKeySequence(seq), self, lambda: None)
-
-        self.browser.setUrl(QUrl("http://127.0.0.1:5000"))
-
-    def keyPressEvent(self, event):
-        if event.key() == Qt.Key_F4 and event.modifiers() == Qt.AltModifier:
-            self.close()
-        super().keyPressEvent(event)
-
-    def wheelEvent(self, event):
-        if event.modifiers() & Qt.ControlModifier:
-            event.ignore()
-        else:
-            super().wheelEvent(event)
+APP_URL = f"http://127.0.0.1:{FLASK_PORT}"
+SERVER_POLL_MS = 20    # how often the splash checks whether Flask is listening
+
+# Shown while the services start; same colours and spinner as the page's loader
+BOOT_SPLASH_HTML = """<!DOCTYPE html><html><head><style>
+html,body{margin:0;height:100%;background:hsl(220 25% 98%);cursor:none}
+body{display:flex;align-items:center;justify-content:center}
+.spinner{width:2rem;height:2rem;border:3px solid hsl(215 16% 88%);border-top-color:hsl(217 90% 55%);
+border-radius:50%;animation:spin 1s linear infinite}
+@keyframes spin{to{transform:rotate(360deg)}}
+</style></head><body><div class="spinner"></div></body></html>"""
+
+# Replaces the splash when boot_services() fails; the kiosk then exits non-zero
+BOOT_ERROR_EXIT_MS = 15000
+BOOT_ERROR_HTML = """<!DOCTYPE html><html><head><style>
+html,body{margin:0;height:100%;background:hsl(220 25% 98%);color:hsl(222 47% 11%);cursor:none;
+font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif}
+body{display:flex;flex-direction:column;align-items:center;justify-content:center;text-align:center}
+h1{font-size:1.5rem;color:hsl(0 84% 62%)}p{color:hsl(220 10% 40%);max-width:40rem}
+</style></head><body><h1>The meter could not start</h1><p>{error}</p><p>Restarting&hellip;</p></body></html>"""
+
+def init_qt_runtime():
+    """XDG runtime dir and Chromium flags QtWebEngine needs; kiosk mode only."""
+    runtime_dir = "/tmp/runtime-root"
+
+    if os.path.exists(runtime_dir):
+        shutil.rmtree(runtime_dir)
+
+    os.makedirs(runtime_dir, mode=0o700)
+
+    # pylint: disable=no-member
+    os.chown(runtime_dir, 0, 0)  # root:root
+    # pylint: enable=no-member
+
+    os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+
+    # Qt / Chromium sandbox settings (uncomment if needed on restricted env)
+    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = "--no-sandbox"
+    # os.environ["XDG_RUNTIME_DIR"] = "/tmp/runtime-root"
+    os.makedirs("/tmp/runtime-root", exist_ok=True)
+    os.chmod("/tmp/runtime-root", 700)
+
+
+def run_kiosk() -> int:
+    """Full-screen browser on the main thread: splash first, the app once Flask is up."""
+    init_qt_runtime()
+    from PyQt5 import QtWidgets, QtCore
+    from PyQt5.QtCore import QUrl, Qt
+    from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
+    from PyQt5.QtGui import QKeySequence
+    from PyQt5.QtWidgets import QShortcut
+    mark_boot("qt_imported")
+
+    class BrowserWindow(QtWidgets.QMainWindow):
+        def __init__(self):
+            super().__init__()
+            self.browser = QWebEngineView()
+            self.setCentralWidget(self.browser)
+            self.setCursor(Qt.BlankCursor)
+            self.showFullScreen()
+            self._app_requested = False
+
+            # ---------- NEW: BLOCK CONTEXT MENU ----------
+            self.browser.setContextMenuPolicy(Qt.NoContextMenu)   # disables right-click menu
+            # ----------------------------------------------
+
+            self.browser.setZoomFactor(1.0)
+            settings = self.browser.settings()
+            settings.setAttribute(QWebEngineSettings.ShowScrollBars, False)
+            settings.setAttribute(QWebEngineSettings.JavascriptEnabled, True)
+
+            self.browser.setAttribute(Qt.WA_AcceptTouchEvents, False)
+            self.setAttribute(Qt.WA_AcceptTouchEvents, False)
+
+
+            ZOOM_PREVENT_JS = """
+            (function(){
+                var m = document.createElement('meta');
+                m.name = 'viewport';
+                m.content = 'width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no';
+                document.head.appendChild(m);
+                var block = function(e){ e.preventDefault(); };
+                document.addEventListener('gesturestart',  block, {passive:false});
+                document.addEventListener('gesturechange', block, {passive:false});
+                document.addEventListener('gestureend',    block, {passive:false});
+                document.addEventListener('touchmove', function(e){
+                    if(e.touches.length>1) e.preventDefault();
+                }, {passive:false});
+                document.addEventListener('wheel', function(e){
+                    if(e.ctrlKey) e.preventDefault();
+                }, {passive:false});
+            })();
+            """
+
+            def _inject(ok: bool):
+                if ok:
+                    self.browser.page().runJavaScript(ZOOM_PREVENT_JS)
+                    mark_boot("ui_page_loaded" if self._app_requested else "splash_shown")
+
+            self.browser.loadFinished.connect(_inject)
+
+            for seq in [QKeySequence.ZoomIn, QKeySequence.ZoomOut, "Ctrl+=", "Ctrl+-", "Ctrl+0"]:
+                QShortcut(QKeySequence(seq), self, lambda: None)
+
+            # Splash now; the app as soon as Flask is listening
+            self.browser.setHtml(BOOT_SPLASH_HTML)
+            self._server_poll = QtCore.QTimer(self)
+            self._server_poll.timeout.connect(self._open_app_when_ready)
+            self._server_poll.start(SERVER_POLL_MS)
+
+        def _open_app_when_ready(self):
+            if _boot_error is not None:
+                self._server_poll.stop()
+                self._app_requested = False
+                self.browser.setHtml(BOOT_ERROR_HTML.replace("{error}", html.escape(_boot_error)))
+                QtCore.QTimer.singleShot(BOOT_ERROR_EXIT_MS, lambda: QtWidgets.QApplication.exit(1))
+                return
+            if self._app_requested or not _flask_ready.is_set():
+                return
+            # Keep polling, slower, so a server that dies later still ends the kiosk
+            self._server_poll.setInterval(1000)
+            self._app_requested = True
+            self.browser.setUrl(QUrl(APP_URL))
+
+        def keyPressEvent(self, event):
+            if event.key() == Qt.Key_F4 and event.modifiers() == Qt.AltModifier:
+                self.close()
+            super().keyPressEvent(event)
+
+        def wheelEvent(self, event):
+            if event.modifiers() & Qt.ControlModifier:
+                event.ignore()
+            else:
+                super().wheelEvent(event)
+
+    qt_app = QtWidgets.QApplication(sys.argv)
+    win = BrowserWindow()
+    win.show()
+    mark_boot("window_created")
+    return qt_app.exec_()
 
 
 LAST_BOOT_ID_FILE = "/var/lib/meter_last_boot_id.txt"
@@ -1585,45 +3598,88 @@ def save_current_boot_id():
 # ----------------------------------------------------------------------
 # 10. Main
 # ----------------------------------------------------------------------
-if __name__ == "__main__":
-    init_db()
+MQTT_START_TIMEOUT = 5    # s; boot goes on without the uplink after this
+
+def boot_services() -> int:
+    """
+    Runs _boot_services(). A failure is logged and left in _boot_error for
+    the kiosk window; returns the process exit code (1 on failure).
+    """
+    global _boot_error
+    try:
+        _boot_services()
+        return 0
+    except Exception as e:
+        _boot_error = f"{type(e).__name__}: {e}"
+        print(f"[BOOT] Startup failed: {_boot_error}")
+        import traceback; traceback.print_exc()
+        return 1
 
-    # === 1. Start MQTT thread FIRST and give it time to initialize ===
-    mqtt_thread = threading.Thread(target=init_mqtt, daemon=True)
-    mqtt_thread.start()
-    time.sleep(3)  # Critical: give MQTT time to start, connect, and possibly flush old queue
+def _boot_services():
+    """
+    Everything behind the UI, in dependency order. Each stage waits on the
+    readiness signal of the one before it instead of a fixed delay; the
+    last one serves HTTP and never returns.
+    """
+    init_db()
+    mark_boot("db_ready")
+
+    threading.Thread(target=_db_checkpoint_worker, daemon=True).start()
+    threading.Thread(target=precompress_static, daemon=True).start()
+    threading.Thread(target=warm_index, daemon=True).start()
+    threading.Thread(target=_roster_resync_worker, daemon=True).start()
+
+    # === 1. MQTT uplink – the outbox is durable and ordered, so events
+    #        queued below follow any left from before the restart ===
+    init_mqtt()
+    if _mqtt_started.wait(MQTT_START_TIMEOUT):
+        mark_boot("mqtt_started")
+    else:
+        print("[BOOT] MQTT worker not started yet — continuing")
 
     # === 2. Detect fresh boot using boot_id ===
     if is_fresh_boot():
         print("[BOOT] Fresh boot detected — resetting viewing session")
 
         # Reset DB state
-        deactivate_all_members_and_publish()  # queues fresh Type 3 (may be flushed already)
+        deactivate_all_members_and_publish()  # queues fresh Type 3
         clear_guests_and_publish()            # queues fresh Type 4
 
-        # === 3. NOW FORCE CLEAR THE QUEUE completely ===
-        with _q_lock:
-            old_size = len(_pub_q)
-            _pub_q.clear()
-            print(f"[BOOT] Fully cleared queue ({old_size} old/stale events removed)")
-
-        # === 4. Re-queue fresh events — these will be the ONLY ones ===
-        deactivate_all_members_and_publish()
-        clear_guests_and_publish()
-        print("[BOOT] Re-queued fresh Type 3 and Type 4 events — clean state")
+        # The outbox lives on disk, so viewing events queued before the
+        # power cut are kept and sent ahead of the fresh reset events.
+        print(f"[BOOT] Outbox holds {_outbox_size()} event(s) including fresh Type 3 and Type 4")
 
     else:
-        print("[BOOT] Same boot — preserving existing queue (offline events safe)")
+        print(f"[BOOT] Same boot — preserving existing queue ({_outbox_size()} offline events safe)")
 
-    # === 5. Save boot_id for next time ===
+    # === 3. Save boot_id for next time ===
     save_current_boot_id()
 
-    # === 6. Start Flask ===
-    threading.Thread(target=run_flask, daemon=True).start()
-    time.sleep(1.5)
+    # === 4. Flask – the window navigates once it is listening ===
+    run_flask()
 
-    # === 7. Start Qt UI ===
-    qt_app = QtWidgets.QApplication(sys.argv)
-    win = BrowserWindow()
-    win.show()
-    sys.exit(qt_app.exec_())
\ No newline at end of file
+
+_IMPORTED_AT = time.time()   # end of module import, reported by main()
+
+def main():
+    global BOOT_MODE
+    parser = argparse.ArgumentParser(description="Touch meter installation UI and uplink")
+    parser.add_argument("--headless", action="store_true",
+                        help="run only the Flask API and the MQTT uplink, without the kiosk window")
+    args = parser.parse_args()
+
+    BOOT_MODE = "headless" if args.headless else "kiosk"
+    print(f"[BOOT] Starting in {BOOT_MODE} mode")
+    mark_boot("imported", at=_IMPORTED_AT)
+    init_device()
+
+    if args.headless:
+        return boot_services()    # serves until the process is stopped
+
+    threading.Thread(target=boot_services, name="boot", daemon=True).start()
+    # === Qt UI right away: splash first, the app once Flask is up ===
+    return run_kiosk()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-request DB latency: connect-per-call (old helpers) vs the pooled WAL layer.
+
+Replays what one dashboard refresh and one member toggle cost in SQLite,
+against a scratch copy of the meter schema. Run it on the meter itself so
+the numbers reflect the SD card:
+
+    python3 bench_db.py --dir /var/lib/apm-bench --iterations 500
+
+Self-contained so it runs against any checkout without the meter's paths;
+the pooled variant mirrors app._db_open / app.db_conn.
+"""
+
+import argparse
+import os
+import queue
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+METER_ID = "IM000000"
+HHID = "HH0001"
+
+SCHEMA = [
+    """CREATE TABLE members (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, meter_id TEXT NOT NULL, hhid TEXT NOT NULL,
+        member_code TEXT, name TEXT, dob TEXT, gender TEXT, created_at TEXT, active INTEGER DEFAULT 0)""",
+    """CREATE TABLE guests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, meter_id TEXT NOT NULL, hhid TEXT NOT NULL,
+        age INTEGER, gender TEXT, active INTEGER DEFAULT 1)""",
+]
+
+
+def seed(path: str):
+    with sqlite3.connect(path) as conn:
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        conn.executemany(
+            "INSERT INTO members (meter_id, hhid, member_code, name, dob, gender, active) "
+            "VALUES (?, ?, ?, ?, ?, ?, 0)",
+            [(METER_ID, HHID, f"M{i}", f"Member {i}", f"19{70 + i}-0{1 + i % 9}-15", "M" if i % 2 else "F")
+             for i in range(6)]
+        )
+        conn.executemany(
+            "INSERT INTO guests (meter_id, hhid, age, gender) VALUES (?, ?, ?, ?)",
+            [(METER_ID, HHID, 20 + i, "F") for i in range(3)]
+        )
+
+
+def refresh(connect):
+    """members + guest count + guest list, one connection each (as the routes do)."""
+    with connect() as conn:
+        conn.execute("SELECT member_code, name, dob, gender, created_at, active "
+                     "FROM members WHERE meter_id = ? AND hhid = ?", (METER_ID, HHID)).fetchall()
+    with connect() as conn:
+        conn.execute("SELECT COUNT(*) FROM guests WHERE meter_id = ? AND hhid = ?", (METER_ID, HHID)).fetchone()
+    with connect() as conn:
+        conn.execute("SELECT age, gender, active FROM guests WHERE meter_id = ? AND hhid = ?",
+                     (METER_ID, HHID)).fetchall()
+
+
+def toggle(connect, i: int):
+    with connect() as conn:
+        conn.execute("UPDATE members SET active = ? WHERE meter_id = ? AND hhid = ? AND member_code = ?",
+                     (i % 2, METER_ID, HHID, "M0"))
+
+
+def make_baseline(path: str):
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    return connect
+
+
+def make_pooled(path: str, size: int = 4):
+    pool = queue.LifoQueue()
+
+    def open_conn():
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connect():
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = open_conn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            if pool.qsize() < size:
+                pool.put(conn)
+            else:
+                conn.close()
+    return connect
+
+
+def measure(fn, iterations: int) -> list:
+    samples = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def summary(samples: list) -> str:
+    q = statistics.quantiles(samples, n=20)
+    return f"mean {statistics.mean(samples):7.3f} ms   p50 {statistics.median(samples):7.3f} ms   p95 {q[18]:7.3f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--dir", help="scratch directory (default: a new temp dir)")
+    ap.add_argument("--iterations", type=int, default=300)
+    args = ap.parse_args()
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="apm-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        for label, factory in (("connect-per-call", make_baseline), ("pooled WAL", make_pooled)):
+            path = os.path.join(workdir, f"{label.split()[0]}.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            seed(path)
+            connect = factory(path)
+            measure(lambda i: refresh(connect), 20)   # warm-up
+            print(f"{label:18s} refresh  {summary(measure(lambda i: refresh(connect), args.iterations))}")
+            print(f"{label:18s} toggle   {summary(measure(lambda i: toggle(connect, i), args.iterations))}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build display-size image variants, the web bundle and the asset manifest.
+
+Reads static/assets, static/css/style.css and static/js/script.js and
+writes static/build:
+
+    avatars/<gender>-<band>-<size>.<hash>.webp|png   one per avatar
+    no_input-<size>.<hash>.webp|png                   raster of the illustration
+    no_input.<hash>.svg                               same SVG, embedded image downscaled
+    app.<hash>.css / app.<hash>.js                    minified style.css / script.js
+    critical.<hash>.css                               first-paint rules, inlined by index.html
+    fonts/<family>-<weight>.<hash>.woff2              Poppins / Material Icons, subset
+    manifest.json                                     what app.py / script.js load
+
+Run it on a development machine after changing anything it reads (needs
+Pillow with WebP support, rcssmin and fontTools with brotli) and commit
+the result:
+
+    python3 build_assets.py --avatar-size 256 --illustration-size 384
+
+Fonts are downloaded from Google Fonts when it can be reached. Offline,
+the faces in static/assets/fonts are vendored instead (Material Symbols
+Rounded covers every icon the UI uses; Poppins has no local source), and
+without those the previously built fonts are kept. The meter itself never
+runs this; index.html loads any family missing from the manifest from the
+Google Fonts stylesheets, without blocking first paint.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import urllib.request
+
+import rcssmin
+from fontTools import subset as ftsubset
+from fontTools.ttLib import TTFont
+from PIL import Image
+
+ROOT       = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+SRC_DIR    = os.path.join(STATIC_DIR, "assets")
+FONT_SRC   = os.path.join(SRC_DIR, "fonts")
+OUT_DIR    = os.path.join(STATIC_DIR, "build")
+FONT_DIR   = os.path.join(OUT_DIR, "fonts")
+CSS_SRC    = os.path.join(STATIC_DIR, "css", "style.css")
+JS_SRC     = os.path.join(STATIC_DIR, "js", "script.js")
+HTML_SRC   = os.path.join(ROOT, "templates", "index.html")
+
+AVATAR_RE     = re.compile(r"^(male|female)-(kid|teen|middle|aged|elder)\.png$")
+DATA_IMAGE_RE = re.compile(r'(href=")data:image/(png|jpeg|webp);base64,([A-Za-z0-9+/=\s]+)(")')
+
+WEBP_QUALITY = 82
+
+# Same stylesheets index.html falls back to; a desktop Chrome UA gets woff2
+FONT_CSS_URLS = (
+    "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap",
+    "https://fonts.googleapis.com/icon?family=Material+Icons",
+)
+FONT_USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+FONT_FACE_RE    = re.compile(r"(?:/\*\s*([\w-]+)\s*\*/\s*)?@font-face\s*{([^}]*)}")
+# Offline sources in FONT_SRC: <family>-<weight>.woff2|ttf|otf, family from the name table
+LOCAL_FONT_RE   = re.compile(r"^[\w-]+-(\d{3})\.(?:woff2|ttf|otf)$")
+# Families subset by ligature (icon names) rather than by character
+ICON_FAMILIES   = {"Material Icons", "Material Symbols Rounded"}
+# Text glyphs kept in Poppins besides whatever non-ASCII the UI actually uses
+TEXT_UNICODES = set(range(0x20, 0x7F)) | set(range(0xA0, 0x100)) | {
+    0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D, 0x2022, 0x2026, 0x20B9,
+}
+
+# Top-level rules inlined for first paint: base, fonts and the loading spinner
+CRITICAL_SELECTORS = {"*", "html", ":root", "body", ".loading", ".spinner"}
+CRITICAL_AT_RULES  = ("@keyframes spin",)
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:10]
+
+
+def encode(im: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "webp":
+        im.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        im.save(buf, "PNG", optimize=True)   # Pillow writes no text/metadata chunks
+    return buf.getvalue()
+
+
+def write_variant(im: Image.Image, out_dir: str, stem: str, fmt: str) -> str:
+    """Writes <stem>.<hash>.<fmt> and returns its path relative to static/."""
+    data = encode(im, fmt)
+    name = f"{stem}.{fingerprint(data)}.{fmt}"
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(data)
+    return os.path.relpath(os.path.join(out_dir, name), STATIC_DIR).replace(os.sep, "/")
+
+
+def fit(im: Image.Image, size: int) -> Image.Image:
+    im = im.convert("RGBA")
+    im.thumbnail((size, size), Image.LANCZOS)
+    return im
+
+
+def build_avatars(size: int) -> dict:
+    out_dir = os.path.join(OUT_DIR, "avatars")
+    os.makedirs(out_dir, exist_ok=True)
+    avatars = {}
+    for name in sorted(os.listdir(SRC_DIR)):
+        if not AVATAR_RE.match(name):
+            continue
+        key = name[:-len(".png")]
+        with Image.open(os.path.join(SRC_DIR, name)) as src:
+            im = fit(src, size)
+        avatars[key] = {
+            "webp": write_variant(im, out_dir, f"{key}-{size}", "webp"),
+            "png": write_variant(im, out_dir, f"{key}-{size}", "png"),
+            "width": im.width,
+            "height": im.height,
+        }
+        print(f"  avatar {key:14s} {os.path.getsize(os.path.join(SRC_DIR, name)) // 1024:5d} KB → "
+              f"{os.path.getsize(os.path.join(STATIC_DIR, avatars[key]['webp'])) // 1024} KB webp")
+    return avatars
+
+
+def minify_svg(text: str, size: int) -> str:
+    """Drops comments/metadata/whitespace and downscales embedded raster images."""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+    text = re.sub(r"<metadata\b.*?</metadata>", "", text, flags=re.S)
+    text = re.sub(r">\s+<", "><", text).strip()
+
+    def shrink(m):
+        with Image.open(io.BytesIO(base64.b64decode(m.group(3)))) as src:
+            data = encode(fit(src, size), "png")
+        return f"{m.group(1)}data:image/png;base64,{base64.b64encode(data).decode()}{m.group(4)}"
+
+    return DATA_IMAGE_RE.sub(shrink, text)
+
+
+def build_illustration(name: str, size: int) -> dict:
+    with open(os.path.join(SRC_DIR, name), encoding="utf-8") as f:
+        svg = f.read()
+    stem = os.path.splitext(name)[0]
+    entry = {}
+
+    m = DATA_IMAGE_RE.search(svg)
+    if m:
+        # The illustration is a raster wrapped in SVG: serve the raster directly
+        with Image.open(io.BytesIO(base64.b64decode(m.group(3)))) as src:
+            im = fit(src, size)
+        entry.update({
+            "webp": write_variant(im, OUT_DIR, f"{stem}-{size}", "webp"),
+            "png": write_variant(im, OUT_DIR, f"{stem}-{size}", "png"),
+            "width": im.width,
+            "height": im.height,
+        })
+
+    data = minify_svg(svg, size).encode("utf-8")
+    svg_name = f"{stem}.{fingerprint(data)}.svg"
+    with open(os.path.join(OUT_DIR, svg_name), "wb") as f:
+        f.write(data)
+    entry["svg"] = f"build/{svg_name}"
+    print(f"  image  {stem:14s} {os.path.getsize(os.path.join(SRC_DIR, name)) // 1024:5d} KB → "
+          f"{len(data) // 1024} KB svg" + (f", {os.path.getsize(os.path.join(STATIC_DIR, entry['webp'])) // 1024} KB webp" if m else ""))
+    return entry
+
+
+# ---- JavaScript ----------------------------------------------------------
+
+JS_WORD_RE        = re.compile(r"[\w$]+")
+REGEX_AFTER_CHARS = set("(,=:[!&|?{};+-*%<>~^")
+REGEX_AFTER_WORDS = {"return", "typeof", "case", "in", "of", "new", "delete", "void",
+                     "throw", "else", "do", "instanceof", "yield", "await"}
+
+
+def js_tokens(js: str):
+    """
+    Yields (kind, text) with kind in ws / comment / literal / code. Strings,
+    regexes and the text parts of template literals are "literal" and pass
+    through untouched; ${...} inside templates is lexed as code again.
+    """
+    i, n = 0, len(js)
+    braces = []    # brace depth inside each open ${, innermost last
+    prev = ""      # last significant token, to tell a regex from a division
+
+    def template(i):
+        while i < n:
+            if js[i] == "\\":
+                i += 2
+            elif js[i] == "`":
+                return i + 1, False
+            elif js.startswith("${", i):
+                return i + 2, True
+            else:
+                i += 1
+        raise ValueError("unterminated template literal")
+
+    while i < n:
+        c, start = js[i], i
+        if c in " \t\r\n":
+            while i < n and js[i] in " \t\r\n":
+                i += 1
+            yield "ws", js[start:i]
+            continue
+        if js.startswith("//", i):
+            i = js.find("\n", i)
+            i = n if i < 0 else i
+            yield "comment", js[start:i]
+            continue
+        if js.startswith("/*", i):
+            i = js.index("*/", i + 2) + 2
+            yield "comment", js[start:i]
+            continue
+
+        if c in "'\"":
+            i += 1
+            while js[i] != c:
+                i += 2 if js[i] == "\\" else 1
+            i += 1
+        elif c == "`" or (c == "}" and braces and braces[-1] == 0):
+            if c == "}":
+                braces.pop()
+            i, opened = template(i + 1)
+            if opened:
+                braces.append(0)
+        elif c == "/" and (prev == "" or prev in REGEX_AFTER_CHARS or prev in REGEX_AFTER_WORDS):
+            i += 1
+            in_class = False
+            while in_class or js[i] != "/":
+                if js[i] == "\\":
+                    i += 1
+                elif js[i] == "[":
+                    in_class = True
+                elif js[i] == "]":
+                    in_class = False
+                i += 1
+            i += 1
+            while i < n and js[i].isalpha():
+                i += 1
+        else:
+            if c.isalnum() or c in "_$":
+                i = JS_WORD_RE.match(js, i).end()
+            else:
+                if c == "{" and braces:
+                    braces[-1] += 1
+                elif c == "}" and braces:
+                    braces[-1] -= 1
+                i += 1
+            prev = js[start:i]
+            yield "code", prev
+            continue
+        prev = "a"     # a literal is a value, so "/" after it divides
+        yield "literal", js[start:i]
+
+
+def _js_needs_space(a: str, b: str) -> bool:
+    word = lambda ch: ch.isalnum() or ch in "_$"
+    return ((word(a) and word(b)) or (a == b and a in "+-") or (a == "/" and b in "/*")
+            or (a.isdigit() and b == "."))
+
+
+def minify_js(js: str) -> str:
+    """
+    Drops comments, indentation and blank lines. Line breaks are kept
+    except next to brackets and separators, so automatic semicolon
+    insertion sees the same code; literal text is never touched.
+    """
+    out, gap, last = [], "", ""
+    for kind, text in js_tokens(js):
+        if kind in ("ws", "comment"):
+            gap = "\n" if "\n" in text or gap == "\n" else " "
+            continue
+        if gap and out:
+            if gap == "\n" and not (last in ("{", ";", ",", "(", "[") or text in ("}", ")", "]")):
+                out.append("\n")
+            elif _js_needs_space(out[-1][-1], text[0]):
+                out.append(" ")
+        out.append(text)
+        gap, last = "", text if kind == "code" else ""
+    return "".join(out) + "\n"
+
+
+def check_minified_js(src: str, out: str):
+    """The minified file must hold exactly the same non-whitespace tokens."""
+    a = [t for t in js_tokens(src) if t[0] in ("code", "literal")]
+    b = [t for t in js_tokens(out) if t[0] in ("code", "literal")]
+    if a != b:
+        bad = next(i for i, (x, y) in enumerate(zip(a + [None], b + [None])) if x != y)
+        raise SystemExit(f"minified JS differs from source at token {bad}: {a[bad:bad + 3]} vs {b[bad:bad + 3]}")
+
+
+# ---- CSS -----------------------------------------------------------------
+
+def css_rules(css: str) -> list:
+    """Top-level rules of comment-free CSS, each with its full block."""
+    rules, depth, start, quote = [], 0, 0, None
+    for i, c in enumerate(css):
+        if quote:
+            if c == quote and css[i - 1] != "\\":
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:i + 1])
+                start = i + 1
+        elif c == ";" and depth == 0:
+            rules.append(css[start:i + 1])
+            start = i + 1
+    return rules
+
+
+def is_critical(rule: str) -> bool:
+    prelude = rule.split("{", 1)[0].strip()
+    if prelude.startswith("@"):
+        return prelude.startswith(CRITICAL_AT_RULES)
+    return all(sel.strip() in CRITICAL_SELECTORS for sel in prelude.split(","))
+
+
+def write_text(text: str, stem: str, ext: str) -> str:
+    data = text.encode("utf-8")
+    name = f"{stem}.{fingerprint(data)}.{ext}"
+    with open(os.path.join(OUT_DIR, name), "wb") as f:
+        f.write(data)
+    return f"build/{name}"
+
+
+def build_bundle() -> dict:
+    with open(JS_SRC, encoding="utf-8") as f:
+        js = f.read()
+    with open(CSS_SRC, encoding="utf-8") as f:
+        css_src = f.read()
+    css = rcssmin.cssmin(css_src)
+
+    min_js = minify_js(js)
+    check_minified_js(js, min_js)
+    critical = "".join(r for r in css_rules(css) if is_critical(r))
+    bundle = {
+        "js": write_text(min_js, "app", "js"),
+        "css": write_text(css, "app", "css"),
+        "critical": write_text(critical, "critical", "css"),
+        # app.py ignores the bundle once style.css / script.js move past these
+        "sources": {"css": fingerprint(css_src.encode("utf-8")), "js": fingerprint(js.encode("utf-8"))},
+    }
+    print(f"  bundle script.js {len(js.encode()) // 1024:5d} KB → {len(min_js.encode()) // 1024} KB, "
+          f"style.css {len(css_src.encode()) // 1024} KB → {len(css.encode()) // 1024} KB, "
+          f"critical {len(critical.encode())} B")
+    return {"app": bundle}
+
+
+# ---- Fonts ---------------------------------------------------------------
+
+def fetch(url: str) -> bytes:
+    req = urllib.request.Request(url, headers={"User-Agent": FONT_USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return resp.read()
+
+
+def ui_text() -> str:
+    """Literal text of script.js plus index.html: every string the UI can show."""
+    with open(JS_SRC, encoding="utf-8") as f:
+        parts = [text for kind, text in js_tokens(f.read()) if kind == "literal"]
+    with open(HTML_SRC, encoding="utf-8") as f:
+        parts.append(f.read())
+    return "\n".join(parts)
+
+
+def ligatures(font: TTFont):
+    """Yields (subtable, first glyph, ligature, name) for every GSUB ligature."""
+    chars = {glyph: chr(code) for code, glyph in font.getBestCmap().items()}
+    for lookup in font["GSUB"].table.LookupList.Lookup:
+        for st in lookup.SubTable:
+            st = getattr(st, "ExtSubTable", st)
+            for first, ligs in getattr(st, "ligatures", {}).items():
+                for lig in ligs:
+                    yield st, first, lig, "".join(chars.get(g, "?") for g in [first] + lig.Component)
+
+
+def prune_icons(font: TTFont, used: set) -> set:
+    """Keeps only the ligatures (icon names) in used; returns the names kept."""
+    keep = {(id(st), first, id(lig)) for st, first, lig, name in ligatures(font) if name in used}
+    names = {name for st, first, lig, name in ligatures(font) if name in used}
+    for st, first, lig, _ in list(ligatures(font)):
+        if (id(st), first, id(lig)) not in keep and lig in st.ligatures.get(first, []):
+            st.ligatures[first].remove(lig)
+    return names
+
+
+def subset_font(data: bytes, unicodes: set, icons: set = None) -> bytes:
+    font = TTFont(io.BytesIO(data))
+    if icons is not None:
+        names = prune_icons(font, icons)
+        unicodes = {ord(ch) for name in names for ch in name}
+    options = ftsubset.Options()
+    options.flavor = "woff2"
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(unicodes=sorted(unicodes))
+    subsetter.subset(font)
+    buf = io.BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+
+def google_faces():
+    """(family, weight, style, display, font bytes) of the latin faces of FONT_CSS_URLS."""
+    sheets = [fetch(url).decode("utf-8") for url in FONT_CSS_URLS]
+    faces = []
+    for css in sheets:
+        for m in FONT_FACE_RE.finditer(css):
+            if m.group(1) not in (None, "latin"):
+                continue
+            desc = dict((k.strip(), v.strip()) for k, v in
+                        (d.split(":", 1) for d in m.group(2).split(";") if ":" in d))
+            faces.append((desc["font-family"].strip("'\""), desc.get("font-weight", "400"),
+                          desc.get("font-style", "normal"), desc.get("font-display", "swap"),
+                          fetch(re.search(r"url\(([^)]+)\)", desc["src"]).group(1))))
+    return faces
+
+
+def local_faces():
+    """Same tuples for the font files in FONT_SRC."""
+    faces = []
+    for name in sorted(os.listdir(FONT_SRC)) if os.path.isdir(FONT_SRC) else []:
+        m = LOCAL_FONT_RE.match(name)
+        if not m:
+            continue
+        with open(os.path.join(FONT_SRC, name), "rb") as f:
+            data = f.read()
+        family = TTFont(io.BytesIO(data))["name"].getDebugName(1)
+        faces.append((family, m.group(1), "normal", "block" if family in ICON_FAMILIES else "swap", data))
+    return faces
+
+
+def build_fonts(previous: dict) -> dict:
+    """
+    Vendors the latin faces of FONT_CSS_URLS, subset to what the UI uses.
+    Offline, the faces in FONT_SRC are vendored instead, and without any
+    the fonts from the previous build are kept as they are.
+    """
+    text = ui_text()
+    words = set(re.findall(r"[a-z0-9_]+", text))
+    unicodes = TEXT_UNICODES | {ord(ch) for ch in text if ord(ch) > 0x7E}
+    try:
+        faces = google_faces()
+    except OSError as e:
+        faces = local_faces()
+        print(f"  fonts  cannot reach Google Fonts ({e}); {len(faces)} local face(s) in "
+              f"{os.path.relpath(FONT_SRC, ROOT)}")
+        if not faces:
+            kept = {k: v for k, v in previous.items()
+                    if os.path.exists(os.path.join(STATIC_DIR, v.get("woff2", "")))}
+            print(f"  fonts  keeping {len(kept)} previously built")
+            return kept
+
+    shutil.rmtree(FONT_DIR, ignore_errors=True)
+    os.makedirs(FONT_DIR)
+    fonts = {}
+    for family, weight, style, display, src in faces:
+        icons = words if family in ICON_FAMILIES else None
+        data = subset_font(src, unicodes, icons)
+        slug = family.lower().replace(" ", "-")
+        name = f"{slug}-{weight}.{fingerprint(data)}.woff2"
+        with open(os.path.join(FONT_DIR, name), "wb") as f:
+            f.write(data)
+        fonts[f"{slug}-{weight}"] = {
+            "family": family,
+            "style": style,
+            "weight": weight,
+            "display": display,
+            "woff2": f"build/fonts/{name}",
+        }
+        print(f"  font   {slug}-{weight:4s} {len(src) // 1024:5d} KB → {len(data) // 1024} KB")
+    return fonts
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--avatar-size", type=int, default=256,
+                    help="avatar edge in px (member cards are ~250 px on the 1024x600 panel)")
+    ap.add_argument("--illustration-size", type=int, default=384,
+                    help="longest edge in px for illustrations")
+    args = ap.parse_args()
+
+    try:
+        with open(os.path.join(OUT_DIR, "manifest.json")) as f:
+            previous_fonts = json.load(f).get("fonts", {})
+    except (OSError, ValueError):
+        previous_fonts = {}
+
+    # Start clean so superseded fingerprints do not pile up (fonts are
+    # replaced by build_fonts, which may have to keep them when offline)
+    os.makedirs(OUT_DIR, exist_ok=True)
+    for name in os.listdir(OUT_DIR):
+        path = os.path.join(OUT_DIR, name)
+        if path != FONT_DIR:
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+    fonts = build_fonts(previous_fonts)
+    manifest = {
+        "avatars": build_avatars(args.avatar_size),
+        "images": {"no_input": build_illustration("no_input.svg", args.illustration_size)},
+        "bundle": build_bundle(),
+        "fonts": fonts,
+    }
+    with open(os.path.join(OUT_DIR, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {os.path.relpath(os.path.join(OUT_DIR, 'manifest.json'), ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -481,13 +481,12 @@
     });
 }
 
-   async function updateMainDashboardWiFiStatus() {
+   async function updateMainDashboardWiFiStatus(data = null) {
     const statusEl = document.getElementById('main-wifi-status');
     if (!statusEl) return;
 
     try {
-        const res = await fetch('/api/current_wifi');
-        const data = await res.json();
+        if (!data) data = await loadWiFiStatus();
 
         let icon = 'wifi_off';
         let color = '#999'; // gray
@@ -813,22 +812,21 @@ function updateGuestCounter() {
         const res = await fetch('/api/get_guests');
         const data = await res.json();
         if (data.success && Array.isArray(data.guests)) {
-            guests = data.guests.map(g => ({
-                age: g.age,
-                gender: g.gender
-            }));
-
-            guests = data.guests.map(g => ({ age: g.age, gender: g.gender }));
-            updateGuestCounter();        // ← This now updates BOTH places
-            updateGuestList();
-            renderGuestCountInMain(); // ← new tiny function below
-            console.log(`Loaded ${guests.length} guests from disk`);
+            applyGuestList(data.guests);
         }
     } catch (e) {
         console.warn("Could not load guests:", e);
     }
 }
 
+function applyGuestList(list) {
+    guests = list.map(g => ({ age: g.age, gender: g.gender }));
+    updateGuestCounter();        // ← This now updates BOTH places
+    updateGuestList();
+    renderGuestCountInMain(); // ← new tiny function below
+    console.log(`Loaded ${guests.length} guests from disk`);
+}
+
 function renderGuestCountInMain() {
     const bottomCount = document.querySelector('.guest-count');
     if (bottomCount) {
@@ -897,43 +895,47 @@ async function sendGuestListToServer() {
 }
 
 
-// Load only the count for main screen (fast)
+// Load only the count for main screen (fast) — pushed count when streaming
 async function updateGuestCountFromFile() {
+    const pushed = pushedState('guests');
+    if (pushed) {
+        renderGuestCount(pushed.count);
+        return;
+    }
     try {
         const res = await fetch('/api/guest_count');
         const data = await res.json();
-        if (data.success) {
-            const count = data.count;
-
-            // Update bottom bar (main screen)
-            const bottom = document.querySelector('.guest-count');
-            if (bottom) bottom.textContent = `${count} / 8 Guests`;
-
-            // Update dialog header (CRITICAL)
-            const header = document.getElementById('guest-counter-header');
-            if (header) header.textContent = count;
-
-            // Update Add button state
-            const btn = document.getElementById('add-guest-btn');
-            if (btn) {
-                btn.disabled = count >= 8;
-                btn.textContent = count >= 8 ? 'Limit Reached' : 'Add';
-            }
-        }
+        if (data.success) renderGuestCount(data.count);
     } catch (e) {
         console.warn("Failed to update guest count:", e);
     }
 }
 
+function renderGuestCount(count) {
+    // Update bottom bar (main screen)
+    const bottom = document.querySelector('.guest-count');
+    if (bottom) bottom.textContent = `${count} / 8 Guests`;
+
+    // Update dialog header (CRITICAL)
+    const header = document.getElementById('guest-counter-header');
+    if (header) header.textContent = count;
+
+    // Update Add button state
+    const btn = document.getElementById('add-guest-btn');
+    if (btn) {
+        btn.disabled = count >= 8;
+        btn.textContent = count >= 8 ? 'Limit Reached' : 'Add';
+    }
+}
+
 // ... end of guest functions ...
 
-async function updateBottomBarWiFiStatus() {
+async function updateBottomBarWiFiStatus(data = null) {
     const bottomBars = document.querySelectorAll('.bottom-bar-allpage .bar-inner');
     if (bottomBars.length === 0) return;
 
     try {
-        const res = await fetch('/api/current_wifi');
-        const data = await res.json();
+        if (!data) data = await loadWiFiStatus();
 
         let icon = 'wifi_off';
         let color = '#999'; // gray
@@ -1002,6 +1004,125 @@ function stopWiFiStatusPolling() {
     }
 }
 
+// Wi-Fi status in /api/current_wifi shape: last pushed state, else fetched
+async function loadWiFiStatus() {
+    const c = pushedState('connectivity');
+    if (c) return { success: c.wifi_connected, ssid: c.ssid, signal: c.signal };
+    const res = await fetch('/api/current_wifi');
+    return res.json();
+}
+
+/* ==============================================================
+   SERVER-PUSH EVENTS (/api/events)
+   One EventSource replaces the polling loops. While it is open the
+   widgets render from the last pushed state; if it drops, Wi-Fi
+   polling resumes until EventSource has reconnected.
+   ============================================================== */
+let eventSource = null;
+let eventStreamOpen = false;
+let bootSeeded = false;   // lastEvent seeded by /api/bootstrap, not yet superseded
+let bootGuests = null;    // guest list from /api/bootstrap for the first main render
+const lastEvent = {};   // kind -> last payload received
+
+// Last pushed payload of a kind, while it can be trusted to be current
+function pushedState(kind) {
+    return (eventStreamOpen || bootSeeded) ? lastEvent[kind] : undefined;
+}
+
+const eventHandlers = {
+    connectivity: c => {
+        const wifi = { success: c.wifi_connected, ssid: c.ssid, signal: c.signal };
+        updateBottomBarWiFiStatus(wifi);
+        updateMainDashboardWiFiStatus(wifi);
+    },
+    input_sources: d => {
+        if (currentState === 'input_source_detection') renderInputSources(d);
+    },
+    video_detection: d => {
+        if (currentState === 'video_object_detection') renderVideoDetection(d);
+    },
+    members: d => {
+        const current = membersData?.members;
+        if (!current) return;
+        const same = current.length === d.members.length &&
+            current.every((m, i) => m.member_code === d.members[i].member_code && m.version === d.members[i].version);
+        if (same) return;
+        membersData.members = d.members;
+        if (currentState === 'main') render();
+    },
+    guests: d => renderGuestCount(d.count),
+    mqtt: d => console.log(`[EVENTS] MQTT ${d.connected ? 'connected' : 'disconnected'}`),
+    brightness: d => {
+        if (isDimmed) return;   // our own pre-dim, not a new baseline
+        const slider = document.getElementById('brightness-slider');
+        if (slider) slider.value = Math.round(((d.brightness - 51) / (255 - 51)) * 255);
+    },
+    job: d => settleJob(d)
+};
+
+/* Cloud calls (HHID, OTP, finalize) run as server-side jobs: the POST
+   answers at once with a job id and the result arrives as a "job"
+   event. /api/jobs/<id> is polled as well, often while the event
+   stream is down and rarely (in case an event was missed) while up. */
+const pendingJobs = {};   // job id -> resolve
+const settledJobs = {};   // job id -> result that arrived before anyone waited
+
+function settleJob(job) {
+    if (job.state === 'running') return;
+    const resolve = pendingJobs[job.id];
+    if (!resolve) { settledJobs[job.id] = job; return; }
+    delete pendingJobs[job.id];
+    resolve(job);
+}
+
+async function runJob(url, payload = {}) {
+    const r = await fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ ...payload, async: true }) });
+    const d = await r.json();
+    if (r.status !== 202 || !d.job_id) return d;   // rejected before any cloud call
+
+    const job = settledJobs[d.job_id] || await new Promise(resolve => {
+        pendingJobs[d.job_id] = resolve;
+        const poll = async () => {
+            if (!pendingJobs[d.job_id]) return;
+            try {
+                const j = await (await fetch(`/api/jobs/${d.job_id}`)).json();
+                if (j.success) settleJob(j);
+            } catch { /* server busy – next round */ }
+            setTimeout(poll, eventStreamOpen ? 5000 : 1000);
+        };
+        setTimeout(poll, eventStreamOpen ? 5000 : 1000);
+    });
+    delete settledJobs[d.job_id];
+    return job.result;
+}
+
+function startEventStream() {
+    if (eventSource) return true;
+    if (typeof EventSource === 'undefined') return false;
+
+    eventSource = new EventSource('/api/events');
+    eventSource.onopen = () => {
+        eventStreamOpen = true;
+        stopWiFiStatusPolling();
+    };
+    eventSource.onerror = () => {
+        // EventSource reconnects by itself; poll Wi-Fi in the meantime
+        bootSeeded = false;
+        if (eventStreamOpen) {
+            eventStreamOpen = false;
+            startWiFiStatusPolling();
+        }
+    };
+    Object.entries(eventHandlers).forEach(([kind, handler]) => {
+        eventSource.addEventListener(kind, e => {
+            const data = JSON.parse(e.data);
+            lastEvent[kind] = data;
+            handler(data);
+        });
+    });
+    return true;
+}
+
 // Load full list only when opening dialog
 async function loadGuestsForDialog() {
     try {
@@ -1991,10 +2112,16 @@ function togglePasswordVisibility(e) {
        /* ---------- MAIN DASHBOARD ---------- */
        /* ---------- MAIN DASHBOARD ---------- */
        if (state === 'main') {
-           await fetchMembers();
-           await loadGuestsFromServer();
+           if (bootGuests) {
+               // First screen after load: members and guests came with /api/bootstrap
+               applyGuestList(bootGuests);
+               bootGuests = null;
+           } else {
+               await fetchMembers();
+               await loadGuestsFromServer();
+           }
            render();
-           updateGuestCountFromFile();     // ← Updates bottom bar instantly
+           renderGuestCount(guests.length);     // ← Updates bottom bar instantly
            // ---- START SCREENSAVER TIMER ONLY ON MAIN ----
            setTimeout(() => {
                if (currentState === 'main') resetScreensaverTimer();
@@ -2013,6 +2140,16 @@ function togglePasswordVisibility(e) {
    let inputSourceRetryInterval = null;
    
    async function fetchInputSources() {
+    try {
+        const r = await fetch('/api/input_sources');
+        renderInputSources(await r.json());
+    } catch (e) {
+        renderInputSources({ success: false, error: e.message });
+    }
+}
+
+   // Renders an /api/input_sources response or a pushed input_sources event
+   function renderInputSources(d) {
     const loading = document.getElementById('input-loading');
     const results = document.getElementById('input-results');
     const ul = results?.querySelector('ul');
@@ -2021,9 +2158,6 @@ function togglePasswordVisibility(e) {
     if (!loading || !results || !ul || !buttonGroup) return;
 
     try {
-        const r = await fetch('/api/input_sources');
-        const d = await r.json();
-
         if (d.success && d.sources?.length > 0) {
             inputSources = d.sources;
 
@@ -2069,7 +2203,9 @@ function togglePasswordVisibility(e) {
 
     } catch (e) {
         inputSources = [];
-        ul.innerHTML = '<li><span class="material-icons">hourglass_top</span> Waiting for input sources...</li>';
+        const art = ASSETS.images?.no_input;
+        ul.innerHTML = (art ? `<li class="no-input-art"><img src="${assetUrl(art)}" width="${art.width}" height="${art.height}" decoding="async" alt=""></li>` : '') +
+            '<li><span class="material-icons">hourglass_top</span> Waiting for input sources...</li>';
         buttonGroup.innerHTML = `
             <button class="button" onclick="fetchInputSources()">
                 <span class="material-icons">refresh</span> Retry Now
@@ -2087,13 +2223,15 @@ function togglePasswordVisibility(e) {
        // Clear any existing interval
        if (inputSourceRetryInterval) clearInterval(inputSourceRetryInterval);
    
-       // Initial call
-       fetchInputSources();
+       // Initial state: pushed already, or fetched once
+       const pushed = pushedState('input_sources');
+       if (pushed) renderInputSources(pushed);
+       else fetchInputSources();
    
-       // Retry every 3 seconds
+       // Retry every 3 seconds — only while the event stream is down
        inputSourceRetryInterval = setInterval(() => {
            if (currentState === 'input_source_detection') {
-               fetchInputSources();
+               if (!eventStreamOpen) fetchInputSources();
            } else {
                clearInterval(inputSourceRetryInterval);
                inputSourceRetryInterval = null;
@@ -2107,6 +2245,16 @@ function togglePasswordVisibility(e) {
       let videoDetectionRetryInterval = null;
    
       async function checkVideoDetection() {
+          try {
+              const r = await fetch('/api/video_detection');
+              renderVideoDetection(await r.json());
+          } catch (e) {
+              renderVideoDetection({ success: false, error: e.message });
+          }
+      }
+
+      // Renders a /api/video_detection response or a pushed video_detection event
+      function renderVideoDetection(d) {
           const loading = document.getElementById('video-loading');
           const results = document.getElementById('video-results');
           const status = document.getElementById('video-status');
@@ -2117,9 +2265,6 @@ function togglePasswordVisibility(e) {
           if (!loading || !results || !status || !buttonGroup) return;
       
           try {
-              const r = await fetch('/api/video_detection');
-              const d = await r.json();
-      
               if (d.success && d.detected) {
                   // SUCCESS: Video detection is working!
                   status.innerHTML = `<div class="success"><span class="material-icons">check_circle</span> Video detection active: ${d.status || 'Running'}</div>`;
@@ -2175,13 +2320,15 @@ function togglePasswordVisibility(e) {
           // Clear any old interval
           if (videoDetectionRetryInterval) clearInterval(videoDetectionRetryInterval);
       
-          // First check immediately
-          checkVideoDetection();
+          // First check immediately (the pushed state when streaming)
+          const pushed = pushedState('video_detection');
+          if (pushed) renderVideoDetection(pushed);
+          else checkVideoDetection();
       
-          // Then retry every 3 seconds while in this state
+          // Then retry every 3 seconds while in this state and not streaming
           videoDetectionRetryInterval = setInterval(() => {
               if (currentState === 'video_object_detection') {
-                  checkVideoDetection();
+                  if (!eventStreamOpen) checkVideoDetection();
               } else {
                   // Stop retrying if user left this step
                   clearInterval(videoDetectionRetryInterval);
@@ -2225,8 +2372,7 @@ function togglePasswordVisibility(e) {
        const btn = event?.target;
        if (btn) { btn.disabled = true; btn.innerHTML = '<span class="material-icons">hourglass_top</span> Sending...'; }
        try {
-           const r = await fetch('/api/submit_hhid', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ hhid }) });
-           const d = await r.json();
+           const d = await runJob('/api/submit_hhid', { hhid });
            if (d.success) { showError('OTP sent! Check email.', 'success'); setTimeout(() => navigate('otp_verification'), 1500); }
            else showError(d.error || 'Invalid HHID');
        } catch { showError('Network error'); }
@@ -2250,12 +2396,7 @@ function togglePasswordVisibility(e) {
        }
    
        try {
-           const r = await fetch('/api/submit_otp', { 
-               method: 'POST', 
-               headers: { 'Content-Type': 'application/json' }, 
-               body: JSON.stringify({ hhid, otp }) 
-           });
-           const d = await r.json();
+           const d = await runJob('/api/submit_otp', { hhid, otp });
    
            if (d.success) {
                CURRENT_HHID = null;
@@ -2295,13 +2436,7 @@ function togglePasswordVisibility(e) {
        btn.innerHTML = '<span class="material-icons spinner-small">hourglass_top</span> Sending…';
    
        try {
-           const r = await fetch('/api/submit_hhid', {
-               method: 'POST',
-               headers: { 'Content-Type': 'application/json' },
-               body: JSON.stringify({ hhid: CURRENT_HHID })
-           });
-   
-           const data = await r.json();
+           const data = await runJob('/api/submit_hhid', { hhid: CURRENT_HHID });
    
            if (data.success) {
                showError("OTP resent! Check your email.", "success");
@@ -2321,8 +2456,7 @@ function togglePasswordVisibility(e) {
        const btn = event?.target;
        if (btn) { btn.disabled = true; btn.innerHTML = '<span class="material-icons">hourglass_top</span> Finalizing...'; }
        try {
-           const r = await fetch('/api/finalize', { method: 'POST' });
-           const d = await r.json();
+           const d = await runJob('/api/finalize');
            if (d.success) { membersData = d.data; navigate('main'); }
            else showError(d.error);
        } catch { showError('Failed to finalize'); }
@@ -2336,11 +2470,13 @@ function togglePasswordVisibility(e) {
        } catch (e) { console.error(e); }
    }
    async function toggleMember(idx) {
-       if (!membersData?.members?.[idx]) return;
+       const m = membersData?.members?.[idx];
+       if (!m) return;
        try {
-           const r = await fetch('/api/toggle_member_status', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ index: idx }) });
+           const r = await fetch('/api/toggle_member_status', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ member_code: m.member_code, version: m.version }) });
            const d = await r.json();
            if (d.success) { membersData.members[idx] = d.member; render(); }
+           else if (r.status === 409 && d.member) { membersData.members[idx] = d.member; render(); }
            else showError(d.error || 'Failed to update');
        } catch { showError('Network error'); }
    }
@@ -2587,10 +2723,10 @@ function togglePasswordVisibility(e) {
        const slider = document.getElementById('brightness-slider');
        if (!slider) return;
    
-       // --- Fetch actual current brightness from backend ---
+       // --- Current brightness: pushed/bootstrapped value, else from backend ---
        try {
-           const res = await fetch('/api/current_brightness');
-           const data = await res.json();
+           const pushed = pushedState('brightness');
+           const data = pushed ? { success: true, ...pushed } : await (await fetch('/api/current_brightness')).json();
            if (data.success && typeof data.brightness === 'number') {
                slider.value = Math.round(((data.brightness - 51) / (255 - 51)) * 255);
                originalBrightness = data.brightness; // keep global in sync
@@ -2625,6 +2761,32 @@ function togglePasswordVisibility(e) {
    
    
    
+   /* ==============================================================
+      BUILT IMAGES – static/build/manifest.json (build_assets.py)
+      Display-size WebP with PNG fallback; without a manifest the
+      original files in /static/assets are used.
+      ============================================================== */
+   const ASSETS = window.ASSET_MANIFEST || {};
+   const webpSupported = document.createElement('canvas').toDataURL('image/webp').startsWith('data:image/webp');
+   const decodedImages = [];   // keeps decoded avatars alive for instant grid paints
+   
+   function assetUrl(entry) {
+       return (webpSupported && entry.webp) || entry.png || entry.svg;
+   }
+   
+   // Decode every avatar (and the no-input art) up front, off the render path
+   function preloadImages() {
+       const entries = [...Object.values(ASSETS.avatars || {}), ...Object.values(ASSETS.images || {})];
+       entries.forEach(entry => {
+           const img = new Image();
+           img.decoding = 'async';
+           img.src = assetUrl(entry);
+           img.decode?.().catch(() => {});
+           decodedImages.push(img);
+       });
+   }
+   preloadImages();
+   
    const avatar = (gender, dob) => {
        if (!gender || !dob) return '/static/assets/default.png';
    
@@ -2640,7 +2802,9 @@ function togglePasswordVisibility(e) {
                age <= 40 ? 'middle' :
                    age <= 60 ? 'aged' : 'elder';
    
-       return `/static/assets/${gender.toLowerCase()}-${cat}.png`;
+       const key = `${gender.toLowerCase()}-${cat}`;
+       const built = ASSETS.avatars?.[key];
+       return built ? assetUrl(built) : `/static/assets/${key}.png`;
    };
    
    
@@ -2803,7 +2967,7 @@ function initEditMemberLift() {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ 
-                index: selectedMemberIndex, 
+                member_code: membersData.members[selectedMemberIndex].member_code,
                 name: name                     // ← Sending "name", not "member_code"
             })
         });
@@ -2841,21 +3005,22 @@ function initEditMemberLift() {
       ============================================================== */
       async function init() {
        try {
-           const [installRes, stateRes] = await Promise.all([
-               fetch('/api/check_installation'),
-               fetch('/api/check_current_state')
-           ]);
+           // One round trip for the whole first screen (see /api/bootstrap)
+           const t0 = performance.now();
+           const res = await fetch('/api/bootstrap');
+           const boot = await res.json();
+           const bootstrapMs = Math.round(performance.now() - t0);
    
-           const installData = await installRes.json();
-           const stateData = await stateRes.json();
+           meterId = boot.meter_id || 'IM000000';
+           Object.assign(lastEvent, boot.events || {});
+           bootSeeded = true;
    
-           meterId = installData.meter_id || 'IM000000';
-   
-           if (installData.installed) {
+           if (boot.installed) {
                currentState = 'main';
-               await fetchMembers();
+               membersData = boot.members;
+               bootGuests = boot.events?.guests?.guests || null;
            } else {
-               let savedState = stateData.current_state || 'welcome';
+               let savedState = boot.current_state || 'welcome';
    
                if (!states[savedState] || savedState === '' || savedState === 'main') {
                    savedState = 'welcome';
@@ -2865,7 +3030,8 @@ function initEditMemberLift() {
            }
    
            console.log("Starting UI in state:", currentState);
-           navigate(currentState);
+           await navigate(currentState);
+           reportTimeToInteractive(bootstrapMs);
    
                
        } catch (err) {
@@ -2874,9 +3040,27 @@ function initEditMemberLift() {
            navigate('welcome');
        }
    }
+   
+   // Logged by the backend as "[BOOT] UI interactive ..."
+   function reportTimeToInteractive(bootstrapMs) {
+       requestAnimationFrame(() => {
+           const tti = Math.round(performance.now());
+           console.log(`[BOOT] Interactive after ${tti} ms (bootstrap ${bootstrapMs} ms)`);
+           fetch('/api/boot_metrics', {
+               method: 'POST',
+               headers: { 'Content-Type': 'application/json' },
+               body: JSON.stringify({
+                   screen: currentState,
+                   tti_ms: tti,
+                   bootstrap_ms: bootstrapMs,
+                   ready_at: Math.round(performance.timeOrigin + tti)
+               })
+           }).catch(() => {});
+       });
+   }
    init();
    //1036 HHID
    // Start polling as soon as the page loads
 document.addEventListener('DOMContentLoaded', () => {
-    startWiFiStatusPolling();
+    if (!startEventStream()) startWiFiStatusPolling();
 });
\ No newline at end of file
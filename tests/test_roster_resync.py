@@ -0,0 +1,140 @@
+"""
+Roster resync against a local http.server stand-in for MEMBERS_URL.
+
+Run from the repository root:  python -m pytest -q tests
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+HHID = "HH1"
+LOCAL = [{"member_code": "A", "name": "Dad", "dob": "1990-01-01", "gender": "M", "active": True}]
+SERVER = [{"member_code": "A", "dob": "1990-01-01", "gender": "M"},
+          {"member_code": "B", "dob": "1991-01-01", "gender": "F"}]
+
+
+class MembersHandler(BaseHTTPRequestHandler):
+    """Answers GET /members with `roster`, honouring If-None-Match when `etags` is on."""
+    protocol_version = "HTTP/1.1"
+    roster = []
+    etags = True
+    log = []     # (status, If-None-Match sent by the meter)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        body = json.dumps({"success": True, "members": cls.roster}).encode()
+        tag = '"%s"' % hashlib.md5(body).hexdigest()
+        sent_tag = self.headers.get("If-None-Match")
+        if cls.etags and sent_tag == tag:
+            cls.log.append((304, sent_tag))
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        cls.log.append((200, sent_tag))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if cls.etags:
+            self.send_header("ETag", tag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def setUpModule():
+    global _tmp, _server
+    _tmp = tempfile.mkdtemp()
+    app.DB_PATH = os.path.join(_tmp, "meter.db")
+    app.DEVICE_CONFIG["device_id_file"] = os.path.join(_tmp, "device_id.txt")
+    app.DEVICE_CONFIG["hhid_file"] = os.path.join(_tmp, "hhid.txt")
+    for key, path in app.SYSTEM_FILES.items():
+        app.SYSTEM_FILES[key] = os.path.join(_tmp, os.path.basename(path))
+    app.init_device()
+    app.init_db()
+    app.save_hhid(HHID)
+    app.set_installation_done()
+
+    _server = ThreadingHTTPServer(("127.0.0.1", 0), MembersHandler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    app.MEMBERS_URL = f"http://127.0.0.1:{_server.server_port}/members"
+
+
+def tearDownModule():
+    _server.shutdown()
+    _server.server_close()
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+class RosterResyncTest(unittest.TestCase):
+
+    def setUp(self):
+        MembersHandler.roster = [dict(m) for m in SERVER]
+        MembersHandler.etags = True
+        MembersHandler.log = []
+        with app.db_conn() as conn:
+            conn.execute("DELETE FROM roster_sync")
+        app.save_members_data({"hhid": HHID, "members": [dict(m) for m in LOCAL]})
+
+        self.published = []
+        publish = app.publish_member_event
+        app.publish_member_event = lambda *a, **k: self.published.append(1)
+        self.addCleanup(setattr, app, "publish_member_event", publish)
+
+    def members(self) -> dict:
+        return {m["member_code"]: m for m in app.load_members_data()["members"]}
+
+    def test_200_applies_delta_and_keeps_local_fields(self):
+        self.assertEqual(app.resync_roster(), "updated")
+        members = self.members()
+        self.assertEqual(sorted(members), ["A", "B"])
+        self.assertEqual((members["A"]["name"], members["A"]["active"]), ("Dad", True))
+        self.assertFalse(members["B"]["active"])
+        self.assertEqual(len(self.published), 1)
+
+    def test_304_writes_nothing_and_publishes_nothing(self):
+        app.resync_roster()
+        before = self.members()
+        self.published.clear()
+
+        self.assertEqual(app.resync_roster(), "unchanged")
+        status, sent_tag = MembersHandler.log[-1]
+        self.assertEqual(status, 304)
+        self.assertIsNotNone(sent_tag)
+        self.assertEqual(self.members(), before)
+        self.assertEqual(self.published, [])
+
+    def test_unchanged_200_without_etag_is_caught_by_digest(self):
+        MembersHandler.etags = False
+        app.resync_roster()
+        before = self.members()
+        self.published.clear()
+
+        self.assertEqual(app.resync_roster(), "unchanged")
+        self.assertEqual(MembersHandler.log, [(200, None), (200, None)])
+        self.assertEqual(self.members(), before)
+        self.assertEqual(self.published, [])
+
+    def test_empty_roster_is_ignored(self):
+        MembersHandler.roster = []
+        before = self.members()
+
+        self.assertEqual(app.resync_roster(), "skipped")
+        self.assertEqual(self.members(), before)
+        self.assertEqual(self.published, [])
+
+
+if __name__ == "__main__":
+    unittest.main()